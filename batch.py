@@ -0,0 +1,210 @@
+# batch.py
+
+import argparse
+import fnmatch
+import glob
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from openpyxl import load_workbook
+
+from .excel_processor import SHEET_NAME, iter_excel_rows, process_excel
+from .instrumentation import RunReport, configure_logging, module_logger
+from .sizing import SizingEngine
+from .table_metadata import MetadataCache
+from .utils import get_renamer, load_keyword_set
+from .validation import ValidationError
+from .yaml_generator import generate_yaml, load_secret_index, task_writer
+
+logger = module_logger(__name__, __spec__)
+
+def find_jobs(patterns, sheet_pattern=SHEET_NAME):
+    """
+    Expand the workbook glob patterns and return one (name, workbook, sheet) job per matching
+    sheet, in sorted workbook order. The name is the workbook name without extension, followed
+    by "__" and the sheet name if the sheet is not the default "Ingestion Details".
+    """
+    workbooks = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            logger.warning("No workbooks match '%s'.", pattern)
+        workbooks.extend(match for match in matches if match not in workbooks)
+
+    jobs = []
+    for workbook in workbooks:
+        book = load_workbook(workbook, read_only=True)
+        try:
+            sheets = fnmatch.filter(book.sheetnames, sheet_pattern)
+        finally:
+            book.close()
+        if not sheets:
+            logger.warning("No sheets of '%s' match '%s'.", workbook, sheet_pattern)
+        for sheet in sheets:
+            name = os.path.splitext(os.path.basename(workbook))[0]
+            if sheet != SHEET_NAME:
+                name = f"{name}__{re.sub(r'[^A-Za-z0-9_.-]+', '_', sheet)}"
+            jobs.append((name, workbook, sheet))
+    return jobs
+
+def run_job(job, args, secret_index, metadata_cache, db_yaml, ogg_yaml, keywords, sizing=None):
+    """
+    Run generate_yaml for one (name, workbook, sheet) job and return its (summary, report).
+    db_yaml and ogg_yaml are output paths, or the shared task writers of a merged run.
+    A job that fails validation writes nothing; its summary lists the problems found.
+    """
+    name, workbook, sheet = job
+    report = RunReport(trace_memory=args.trace_memory)
+    logger.info("Processing sheet '%s' of '%s'.", sheet, workbook)
+    try:
+        return run_generate(job, args, secret_index, metadata_cache, db_yaml, ogg_yaml, keywords, report, sizing), report
+    except ValidationError as error:
+        logger.error("Validation of '%s' failed: %s. Skipping it.", name, error)
+        return {"validation": [problem._asdict() for problem in error.problems]}, report
+
+def run_generate(job, args, secret_index, metadata_cache, db_yaml, ogg_yaml, keywords, report, sizing=None):
+    """
+    Read a job's sheet and run generate_yaml over it, recording its stages in report.
+    """
+    name, workbook, sheet = job
+
+    with report.stage("read_excel"):
+        if args.stream:
+            df = iter_excel_rows(workbook, sheet_name=sheet)
+        else:
+            df = process_excel(workbook, args.json_folder, sheet_name=sheet)
+
+    # generate_yaml creates the job's output folder (after validating the sheet)
+    output_dir = os.path.join(args.output_dir, name) if args.output_dir else None
+    return generate_yaml(
+        df, db_yaml, ogg_yaml, args.json_folder,
+        workers=args.workers,
+        use_processes=args.processes,
+        manifest_path=None if args.no_manifest else f".dex_build_manifest.{name}.pkl",
+        force=args.force,
+        output_dir=output_dir,
+        keywords=keywords,
+        io_workers=args.io_workers,
+        fsync=not args.no_fsync,
+        report=report,
+        secret_index=secret_index,
+        metadata_cache=metadata_cache,
+        validate_first=not args.no_validate,
+        shard_by=args.shard_by,
+        shard_size=args.shard_size,
+        sizing=sizing,
+    )
+
+def job_yaml_paths(name, args):
+    """
+    Return the DBtoRedshift/OGGToRedshift paths of a job when each workbook gets its own files.
+    """
+    folder = os.path.join(args.output_dir, name) if args.output_dir else "."
+    return os.path.join(folder, f"{name}_DBtoRedshift.yml"), os.path.join(folder, f"{name}_OGGToRedshift.yml")
+
+def run_batch(args):
+    """
+    Process every matching workbook sheet in this process, sharing the secret index, the
+    keyword rename cache, the JSON metadata cache and the sizing engine (with --sizing) between them. Returns the
+    {name: (summary, report)} results of the jobs and the metadata cache statistics.
+    """
+    jobs = find_jobs(args.workbooks, args.sheets)
+    if not jobs:
+        logger.error("Nothing to process.")
+        return {}, None
+
+    # Shared by every job: the secret index, the keyword renamer and the loaded JSON files
+    secret_index = load_secret_index(os.path.join(os.path.dirname(args.json_folder), "secret_name.json"))
+    keywords = get_renamer(load_keyword_set(args.keywords_file) if args.keywords_file else None).keywords
+    metadata_cache = MetadataCache()
+    sizing = SizingEngine() if args.sizing else None
+
+    # Without an output directory, every job rewrites the same srcl folder, so jobs run one at a time;
+    # merged YAML files are written in job order, so merged jobs also run one at a time
+    jobs_in_parallel = args.jobs
+    if jobs_in_parallel > 1 and (args.merged or not args.output_dir):
+        logger.warning("Running the workbooks one at a time (--jobs needs --output-dir and per-workbook YAML files).")
+        jobs_in_parallel = 1
+
+    results = {}
+    if args.merged:
+        if args.output_dir and not os.path.exists(args.output_dir):
+            os.makedirs(args.output_dir)
+        folder = args.output_dir or "."
+        fsync = not args.no_fsync
+        with task_writer(os.path.join(folder, "DBtoRedshift.yml"), fsync=fsync, shard_by=args.shard_by,
+                         shard_size=args.shard_size, workers=args.io_workers) as db_writer, \
+                task_writer(os.path.join(folder, "OGGToRedshift.yml"), write_empty=False, fsync=fsync, shard_by=args.shard_by,
+                            shard_size=args.shard_size, workers=args.io_workers) as ogg_writer:
+            for job in jobs:
+                results[job[0]] = run_job(job, args, secret_index, metadata_cache, db_writer, ogg_writer, keywords, sizing)
+        logger.info("Merged %d DBtoRedshift and %d OGGToRedshift tasks of %d sheets.", db_writer.count, ogg_writer.count, len(jobs))
+    elif jobs_in_parallel > 1:
+        with ThreadPoolExecutor(max_workers=jobs_in_parallel) as executor:
+            futures = {job[0]: executor.submit(run_job, job, args, secret_index, metadata_cache, *job_yaml_paths(job[0], args), keywords, sizing)
+                       for job in jobs}
+            for name, future in futures.items():
+                results[name] = future.result()
+    else:
+        for job in jobs:
+            results[job[0]] = run_job(job, args, secret_index, metadata_cache, *job_yaml_paths(job[0], args), keywords, sizing)
+
+    cache_stats = metadata_cache.stats()
+    logger.info("JSON metadata cache: %d hits, %d misses.", cache_stats["hits"], cache_stats["misses"])
+    return results, cache_stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the YAML and SQL outputs of several ingestion templates in one process.")
+    parser.add_argument("workbooks", nargs="+", help="Workbook paths or glob patterns, e.g. 'templates/*.xlsx'")
+    parser.add_argument("--sheets", default=SHEET_NAME, help=f"Sheet name or glob pattern to process in each workbook (default: '{SHEET_NAME}')")
+    parser.add_argument("--json-folder", default="srcl", help="Folder containing the JSON files (default: srcl)")
+    parser.add_argument("--output-dir", help="Write each workbook's srcl, srcl_vw, temp and YAML files to DIR/<workbook> instead of in place")
+    parser.add_argument("--merged", action="store_true", help="Write one DBtoRedshift.yml/OGGToRedshift.yml for all workbooks instead of one pair per workbook")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of workbooks processed in parallel (needs --output-dir; default: 1)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of parallel workers for per-table processing within a workbook (default: 1)")
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of a thread pool when --workers > 1")
+    parser.add_argument("--stream", action="store_true", help="Stream the Excel rows in read-only mode instead of loading a DataFrame")
+    parser.add_argument("--force", action="store_true", help="Ignore the build manifests and regenerate every table")
+    parser.add_argument("--no-validate", action="store_true", help="Skip the pre-flight validation of each sheet and its JSON files")
+    parser.add_argument("--no-manifest", action="store_true", help="Do not use or write the per-workbook build manifests")
+    parser.add_argument("--shard-by", choices=["system", "source_db", "frequency", "size"],
+                        help="Write the tasks to one YAML file per source system, source_db, refresh frequency or --shard-size tasks, in a folder per YAML file")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Number of tasks per shard with --shard-by size (default: 1000)")
+    parser.add_argument("--sizing", action="store_true",
+                        help="Size source_predicate_count from the table size and column types, and set the recommended column encodings in the temp JSON files")
+    parser.add_argument("--io-workers", type=int, default=4, help="Number of background threads writing the JSON and SQL files of each workbook (default: 4)")
+    parser.add_argument("--no-fsync", action="store_true", help="Do not fsync the written files")
+    parser.add_argument("--keywords-file", help="Rename columns matching the keywords in this file instead of the Redshift keywords")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Log level (default: INFO)")
+    parser.add_argument("--report", default="dex_batch_report.json", help="Write the JSON run report of all workbooks here (default: dex_batch_report.json)")
+    parser.add_argument("--trace-memory", action="store_true", help="Record the peak traced memory of each stage in the run report (slower)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """
+    Run the batch and write its report. Returns the exit status: 1 if no sheet matched or a
+    sheet failed validation, 0 otherwise.
+    """
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    batch_report = RunReport()
+    results, cache_stats = run_batch(args)
+
+    # One report for the whole batch, with the report of every workbook sheet
+    report = batch_report.to_dict()
+    report["metadata_cache"] = cache_stats
+    report["jobs"] = {name: job_report.to_dict(summary) for name, (summary, job_report) in results.items()}
+    with open(args.report, "w") as report_file:
+        json.dump(report, report_file, indent=4, default=str)
+    logger.info("Run report written to '%s'.", args.report)
+
+    failed = [name for name, (summary, _) in results.items() if "validation" in summary]
+    if failed:
+        logger.error("%d of %d sheets failed validation: %s.", len(failed), len(results), ", ".join(failed))
+    return 1 if failed or not results else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+# benchmark.py
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+import yaml
+
+from .column_lists import ColumnList
+from .excel_processor import SHEET_NAME, process_excel
+from .output_writer import OutputWriter
+from .row_records import prepare_rows
+from .sql_generator import SqlViewWriter, generate_sql_file, render_table_view
+from .table_metadata import TableMetadata
+from .validation import validate
+from .yaml_emitter import ColumnListDumperMixin, TaskStreamWriter, represent_column_list
+from .yaml_generator import (
+    SecretIndex,
+    build_tasks,
+    create_temp_folder_and_update_schema,
+    enrich_metadata,
+    get_secret_name,
+    load_secret_names,
+)
+
+# Number of tables generated for each named scale
+SCALES = {
+    "small": 100,
+    "medium": 10000,
+    "large": 100000,
+}
+
+# Column names that collide with Redshift keywords, mixed into the synthetic tables
+KEYWORD_COLUMNS = ["ORDER", "STATUS", "DATE", "USER", "TABLE", "SELECT", "OFFSET", "TIMESTAMP"]
+
+class ReferenceDumper(ColumnListDumperMixin, yaml.Dumper):
+    """
+    The pure-Python dumper of the reference yaml.dump stage, writing ColumnLists as TaskDumper does.
+    """
+
+ReferenceDumper.add_representer(ColumnList, represent_column_list)
+
+def make_template_frame(n_rows, seed=0):
+    """
+    Build a synthetic "Ingestion Details" DataFrame (normalised column names) with
+    a mix of sybase, OGG, archived, PII and >10GB tables.
+    """
+    rng = random.Random(seed)
+    records = []
+    for i in range(n_rows):
+        db_type = rng.choice(["oracle", "Oracle", "mssql", "sybase"])
+        is_ogg = db_type.lower() == "oracle" and rng.random() < 0.5
+        is_archived = rng.random() < 0.2
+        is_pii = rng.random() < 0.3
+        records.append({
+            "source table name": f"SCH{i % 50}.TABLE_{i}",
+            "source system name": f"sys{i % 20}",
+            "data refresh frequency": rng.choice(["Daily", "Weekly", "Monthly", None]),
+            "json file": f"table_{i}.json",
+            "table classification": rng.choice(["Confidential", "Internal", "Public"]),
+            "is pii [y/n]": "Y" if is_pii else "N",
+            "is spii [y/n]": "Y" if rng.random() < 0.1 else "N",
+            "pii column name": "COL_1" if is_pii else None,
+            "spii column name": "COL_2" if rng.random() < 0.1 else None,
+            "source system database name": f"DB{i % 200}",
+            "source system db type": db_type,
+            "task2": "OGGToRedshift" if is_ogg else None,
+            "source table size (gb)": rng.choice([0.5, 2, 8, 15, 120, None]),
+            "reliable date column": rng.choice(["UPDATED_AT", None]),
+            "table archived (y/n)": "Y" if is_archived else "N",
+            "source archival/history schema name": f"HIST{i % 50}" if is_archived else None,
+            "source archival/history table name": f"HIST{i % 50}.TABLE_{i}_H" if is_archived else None,
+            "source table pk": rng.choice(["ID", "ID, VERSION", None]),
+        })
+    return pd.DataFrame(records)
+
+def derive_with_iterrows(df):
+    """
+    Derive the per-row fields the way generate_yaml did before row_records existed:
+    one pandas Series per row and repeated label lookups.
+    """
+    derived = []
+    for index, row in df.iterrows():
+        table_name = row["source table name"]
+        if pd.isna(table_name):
+            continue
+        schema_name, table_name_without_schema = table_name.split(".", 1)
+        target_table = f"{row['source system name']}_{table_name_without_schema}"
+        refresh_frequency = row["data refresh frequency"]
+        if pd.isna(refresh_frequency):
+            refresh_frequency = "unknown"
+        task_id = f"de_etl_{target_table}_{refresh_frequency.lower()}"
+        is_sybase = row["source system db type"].lower() == "sybase"
+        is_ogg = row["source system db type"].lower() != "sybase" and row["task2"] == "OGGToRedshift"
+        source_table_size_gb = row["source table size (gb)"]
+        is_large = pd.notna(source_table_size_gb) and source_table_size_gb > 10 and pd.notna(row["reliable date column"])
+        hist_source_table = None
+        if row["table archived (y/n)"] == "Y":
+            hist_source_table = row["source archival/history table name"].split(".")[-1]
+        primary_keys = row["source table pk"]
+        if pd.notna(primary_keys):
+            primary_keys = [key.strip() for key in primary_keys.split(",")]
+        else:
+            primary_keys = None
+        derived.append((schema_name, task_id, is_sybase, is_ogg, is_large, hist_source_table, primary_keys))
+    return derived
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_row_pipeline(n_rows=50000, seed=0):
+    """
+    Time the iterrows() row derivation against row_records.prepare_rows on a synthetic template.
+    """
+    df = make_template_frame(n_rows, seed)
+    iterrows_seconds = time_call(derive_with_iterrows, df)
+    prepare_rows_seconds = time_call(prepare_rows, df)
+    return {
+        "rows": n_rows,
+        "iterrows_seconds": round(iterrows_seconds, 4),
+        "prepare_rows_seconds": round(prepare_rows_seconds, 4),
+        "speedup": round(iterrows_seconds / prepare_rows_seconds, 1),
+    }
+
+def bench_secret_lookup(n_secrets=10000, n_lookups=10000, seed=0):
+    """
+    Time get_secret_name over a secret_names list (linear scan) against a SecretIndex,
+    for 100, 1000, ... up to n_secrets secrets. About 10% of the lookups have no secret.
+    """
+    rng = random.Random(seed)
+    results = []
+    sizes = [size for size in (100, 1000, 10000, 100000) if size < n_secrets] + [n_secrets]
+    for size in sizes:
+        secret_names = [{"source_db": f"DB{d}", "secret_name": f"dex/source/db{d}"} for d in range(size)]
+        source_dbs = [f"DB{rng.randrange(int(size * 1.1))}" for _ in range(n_lookups)]
+
+        start = time.perf_counter()
+        secret_index = SecretIndex(secret_names)
+        index_build_seconds = time.perf_counter() - start
+
+        list_seconds = time_call(lambda: [get_secret_name(source_db, secret_names) for source_db in source_dbs])
+        index_seconds = time_call(lambda: [get_secret_name(source_db, secret_index) for source_db in source_dbs])
+        results.append({
+            "secrets": size,
+            "lookups": n_lookups,
+            "index_build_seconds": round(index_build_seconds, 4),
+            "list_scan_us_per_lookup": round(list_seconds / n_lookups * 1e6, 3),
+            "index_us_per_lookup": round(index_seconds / n_lookups * 1e6, 3),
+        })
+    return results
+
+def write_synthetic_inputs(root, n_tables, min_columns=10, max_columns=1000, seed=0):
+    """
+    Write a synthetic DEX ingestion workbook, its srcl/*.json metadata and a
+    secret_name.json (with some source databases left without a secret) under root.
+    Returns the paths of the workbook and the srcl folder.
+    """
+    rng = random.Random(seed)
+    df = make_template_frame(n_tables, seed)
+
+    json_folder = os.path.join(root, "srcl")
+    os.makedirs(json_folder, exist_ok=True)
+    for i, json_file_name in enumerate(df["json file"]):
+        n_columns = rng.randint(min_columns, max_columns)
+        columns = [{
+            "name": KEYWORD_COLUMNS[c % len(KEYWORD_COLUMNS)] if c % 10 == 9 else f"COL_{c}",
+            "type": rng.choice(["varchar(255)", "integer", "bigint", "timestamp", "numeric(18,2)"]),
+            "encoding": "ZSTD",
+            "isActive": True,
+            "nullable": True,
+            "default": None,
+        } for c in range(n_columns)]
+        json_data = {"schemaName": "srcl", "tableName": f"table_{i}", "columns": columns}
+        with open(os.path.join(json_folder, json_file_name), "w") as json_file:
+            json.dump(json_data, json_file, indent=4)
+
+    secrets = [{"source_db": f"DB{d}", "secret_name": f"dex/source/db{d}"} for d in range(0, 200, 2)]
+    with open(os.path.join(root, "secret_name.json"), "w") as secret_file:
+        json.dump(secrets, secret_file, indent=4)
+
+    # Write the sheet with title-cased headers, as in the real template
+    input_excel = os.path.join(root, "DEX-Table_Ingestion_Template-V1.xlsx")
+    df.columns = [column.title() for column in df.columns]
+    df.to_excel(input_excel, sheet_name=SHEET_NAME, index=False, engine="openpyxl")
+    return input_excel, json_folder
+
+class StageTimer:
+    """
+    Collect the wall time of named stages.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = round(time.perf_counter() - start, 4)
+
+def run_stage_benchmark(input_excel, json_folder):
+    """
+    Run the pipeline stages one after another over a synthetic template and time each one:
+    process_excel, the pre-flight validation, prepare_rows, JSON load and rename, JSON writes (direct and through the OutputWriter),
+    generate_sql_file, the batched SQL renderer, task building,
+    yaml.dump, the streaming TaskStreamWriter and create_temp_folder_and_update_schema. Outputs go next to json_folder.
+    The memory held by the tasks of every table (as the build manifest and plan_tasks hold them)
+    is also measured with tracemalloc, outside the timed stages.
+    """
+    root = os.path.dirname(json_folder)
+    srcl_vw_folder = os.path.join(root, "srcl_vw")
+    os.makedirs(srcl_vw_folder, exist_ok=True)
+    timer = StageTimer()
+
+    # Keep anything the stages print out of the benchmark output (their log messages are not configured here)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with timer.stage("process_excel"):
+            df = process_excel(input_excel, json_folder)
+
+        with timer.stage("validate"):
+            validate(df, json_folder)
+
+        with timer.stage("prepare_rows"):
+            rows = [row for row in prepare_rows(df) if row.table_name_without_schema is not None]
+
+        tables = []
+        with timer.stage("json_load_rename"):
+            for row in rows:
+                metadata = TableMetadata.load(os.path.join(json_folder, row.json_file))
+                column_list, column_rename = enrich_metadata(metadata, row)
+                tables.append((row, metadata, column_list, column_rename))
+
+        with timer.stage("json_write"):
+            for row, metadata, _, _ in tables:
+                metadata.save(os.path.join(json_folder, row.json_file))
+
+        # The same files through the background OutputWriter, into an empty folder
+        output_folder = os.path.join(root, "srcl_output_writer")
+        os.makedirs(output_folder, exist_ok=True)
+        with timer.stage("json_write_output_writer"):
+            with OutputWriter() as output:
+                for row, metadata, _, _ in tables:
+                    output.submit(os.path.join(output_folder, row.json_file), metadata.to_json())
+
+        with timer.stage("generate_sql_file"):
+            for row, metadata, column_list, _ in tables:
+                generate_sql_file(
+                    os.path.join(json_folder, row.json_file),
+                    column_list,
+                    row.table_classification,
+                    row.is_pii,
+                    row.is_spii,
+                    row.pii_column_name,
+                    row.spii_column_name,
+                    srcl_vw_folder,
+                    metadata=metadata,
+                )
+
+        # The batched renderer generate_yaml uses, over the same tables
+        with timer.stage("sql_render_batch"):
+            with SqlViewWriter(srcl_vw_folder) as sql_writer:
+                for row, metadata, column_list, _ in tables:
+                    sql_writer.add(*render_table_view(
+                        os.path.join(json_folder, row.json_file),
+                        column_list,
+                        row.table_classification,
+                        row.is_pii,
+                        row.is_spii,
+                        row.pii_column_name,
+                        row.spii_column_name,
+                        srcl_vw_folder,
+                        metadata=metadata,
+                    ))
+
+        yaml_data = []
+        yaml_data2 = []
+        with timer.stage("build_tasks"):
+            secret_names = SecretIndex(load_secret_names(os.path.join(root, "secret_name.json")))
+            for row, _, column_list, column_rename in tables:
+                db_tasks, ogg_tasks = build_tasks(row, column_list, column_rename, get_secret_name(row.source_db, secret_names))
+                yaml_data.extend(db_tasks)
+                yaml_data2.extend(ogg_tasks)
+
+        # Build the tasks again under tracemalloc from a fresh column list per table, as process_row does;
+        # the column names are already loaded, so this is the memory the tasks of every table keep
+        tracemalloc.start()
+        retained = [build_tasks(row, list(column_list), column_rename, get_secret_name(row.source_db, secret_names))
+                    for row, _, column_list, column_rename in tables]
+        task_memory_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del retained
+
+        # The pure-Python yaml.dump generate_yaml used before the streaming emitter, for reference
+        with timer.stage("yaml_dump"):
+            for tasks, yaml_name in ((yaml_data, "DBtoRedshift.yml"), (yaml_data2, "OGGToRedshift.yml")):
+                with open(os.path.join(root, yaml_name), "w") as yaml_file:
+                    yaml.dump(tasks, yaml_file, Dumper=ReferenceDumper, default_flow_style=False, sort_keys=False, default_style=None)
+
+        with timer.stage("yaml_stream"):
+            for tasks, yaml_name in ((yaml_data, "DBtoRedshift.yml"), (yaml_data2, "OGGToRedshift.yml")):
+                with TaskStreamWriter(os.path.join(root, yaml_name)) as writer:
+                    writer.write(tasks)
+
+        with timer.stage("create_temp_folder_and_update_schema"):
+            create_temp_folder_and_update_schema(json_folder, tables=[metadata for _, metadata, _, _ in tables])
+
+    return {
+        "rows": len(df),
+        "tables": len(tables),
+        "columns": sum(len(column_list) for _, _, column_list, _ in tables),
+        "db_tasks": len(yaml_data),
+        "ogg_tasks": len(yaml_data2),
+        "task_memory_bytes": task_memory_bytes,
+        "stages": timer.stages,
+        "total_seconds": round(sum(timer.stages.values()), 4),
+    }
+
+def run_benchmark(n_tables, min_columns=10, max_columns=1000, seed=0, work_dir=None, compare_rows=False):
+    """
+    Generate a synthetic template of n_tables tables and time the pipeline stages.
+    Returns the results as a JSON-serialisable dict.
+    """
+    root = tempfile.mkdtemp(prefix="dex_bench_", dir=work_dir)
+    try:
+        start = time.perf_counter()
+        input_excel, json_folder = write_synthetic_inputs(root, n_tables, min_columns, max_columns, seed)
+        generate_seconds = time.perf_counter() - start
+
+        results = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "tables": n_tables,
+            "min_columns": min_columns,
+            "max_columns": max_columns,
+            "seed": seed,
+            "input_generation_seconds": round(generate_seconds, 4),
+            "pipeline": run_stage_benchmark(input_excel, json_folder),
+        }
+        if compare_rows:
+            results["row_derivation"] = bench_row_pipeline(n_tables, seed)
+        return results
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Excel to YAML/SQL pipeline on synthetic templates.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Number of tables: small=100, medium=10k, large=100k")
+    parser.add_argument("--tables", type=int, help="Number of tables (overrides --scale)")
+    parser.add_argument("--min-columns", type=int, default=10, help="Minimum number of columns per table (default: 10)")
+    parser.add_argument("--max-columns", type=int, default=1000, help="Maximum number of columns per table (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the synthetic inputs")
+    parser.add_argument("--work-dir", help="Directory for the synthetic inputs and outputs (default: system temp)")
+    parser.add_argument("--compare-rows", action="store_true", help="Also compare iterrows() against prepare_rows on the same number of rows")
+    parser.add_argument("--rows", type=int, help="Only compare iterrows() against prepare_rows on this many rows, without writing any files")
+    parser.add_argument("--secrets", type=int, help="Only compare the secret list scan against the SecretIndex with up to this many secrets, e.g. --secrets 10000")
+    parser.add_argument("--output", help="Write the results as JSON to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.rows is not None or args.secrets is not None:
+        results = {}
+        if args.rows is not None:
+            results["row_derivation"] = bench_row_pipeline(args.rows, args.seed)
+        if args.secrets is not None:
+            results["secret_lookup"] = bench_secret_lookup(args.secrets, seed=args.seed)
+    else:
+        n_tables = args.tables if args.tables is not None else SCALES[args.scale]
+        results = run_benchmark(n_tables, args.min_columns, args.max_columns, args.seed, args.work_dir, args.compare_rows)
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=4)
+        print(f"Benchmark results written to '{args.output}'.")
+    else:
+        print(json.dumps(results, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# build_cache.py
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the generated tasks or files change shape, so old manifests are ignored
+MANIFEST_VERSION = 4
+
+def hash_file(file_path, io_stats=None):
+    """
+    Return the SHA-1 hex digest of a file's content, or None if the file does not exist.
+    """
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    if io_stats is not None:
+        io_stats.add("cache", "reads")
+    return digest
+
+def row_fingerprint(row):
+    """
+    Return a content hash of an Excel row (anything with an items() method, e.g. a TableRow).
+    """
+    items = list(row.items())
+    payload = json.dumps(items, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class BuildManifest:
+    """
+    On-disk record of the last run, keyed by the content hash of each Excel row.
+    Each entry stores the hash of the row's JSON file (as written by the last run),
+    the task dicts built for the row, their rendered YAML and the output files generated for it.
+    """
+
+    def __init__(self, manifest_path, secret_file_path, force=False, keywords=None, sizing=None):
+        self.manifest_path = manifest_path
+        self.secret_hash = hash_file(secret_file_path)
+        self.keywords_hash = hashlib.sha1("\n".join(sorted(keywords or [])).encode("utf-8")).hexdigest()
+        self.sizing = sizing  # Version of the sizing.SizingEngine the tasks are built with, if any
+        self.previous = {}
+        self.entries = {}
+        self._column_renames = None
+
+        if force:
+            logger.info("Ignoring build manifest (--force).")
+        else:
+            self.previous = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "rb") as manifest_file:
+                manifest = pickle.load(manifest_file)
+        except Exception as e:
+            # Like any cache, a manifest that cannot be loaded (truncated, foreign, or pickled by
+            # an older version of the package) only means a full rebuild
+            logger.warning("Could not read build manifest '%s': %s", self.manifest_path, e)
+            return {}
+
+        # A new manifest version, a changed secret file, keyword set or sizing invalidates every entry
+        if (not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION or manifest.get("secret_hash") != self.secret_hash
+                or manifest.get("keywords_hash") != self.keywords_hash or manifest.get("sizing") != self.sizing):
+            return {}
+        return manifest.get("entries", {})
+
+    def lookup(self, row_key, json_file_path, outputs, io_stats=None):
+        """
+        Return the cached (db_tasks, ogg_tasks) for a row, or None if it has to be rebuilt.
+        A row is reused only if its JSON file is unchanged and it was built into the same outputs
+        (e.g. not into another --output-dir), which all still exist on disk.
+        """
+        entry = self.previous.get(row_key)
+        if entry is None:
+            return None
+        if entry["outputs"] != outputs or not all(os.path.exists(path) for path in outputs):
+            return None
+        if json_file_path is not None and hash_file(json_file_path, io_stats) != entry["json_hash"]:
+            return None
+
+        self.entries[row_key] = entry
+        return entry["tasks"]
+
+    def previous_column_renames(self):
+        """
+        Return the column_rename of the DBtoRedshift tasks built by the last run, by task_id.
+        """
+        if self._column_renames is None:
+            self._column_renames = {}
+            for entry in self.previous.values():
+                for task in entry["tasks"][0]:
+                    body = task.get("DBtoRedshift", {})
+                    if body.get("column_rename"):
+                        self._column_renames[body["task_id"]] = body["column_rename"]
+        return self._column_renames
+
+    def yaml_fragments(self, row_key):
+        """
+        Return the (DBtoRedshift, OGGToRedshift) yaml_emitter.YamlFragments of a row returned by
+        lookup(), or None if they were not recorded. A fragment is None if it was not rendered.
+        """
+        return self.entries[row_key].get("yaml")
+
+    def record(self, row_key, json_file_path, tasks, outputs, io_stats=None, yaml_fragments=None):
+        """
+        Record the tasks, their rendered YAML fragments and outputs built for a row, hashing its JSON file as written.
+        """
+        self.entries[row_key] = {
+            "json_hash": hash_file(json_file_path, io_stats) if json_file_path is not None else None,
+            "tasks": tasks,
+            "yaml": yaml_fragments,
+            "outputs": outputs,
+        }
+
+    def save(self):
+        """
+        Write the manifest, keeping only the rows seen in this run.
+        """
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "secret_hash": self.secret_hash,
+            "keywords_hash": self.keywords_hash,
+            "sizing": self.sizing,
+            "entries": self.entries,
+        }
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "wb") as manifest_file:
+            pickle.dump(manifest, manifest_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.manifest_path)
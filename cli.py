@@ -0,0 +1,165 @@
+# cli.py
+
+import argparse
+import os
+import sys
+
+from .excel_processor import SHEET_NAME
+from .instrumentation import configure_logging, module_logger
+from .main import add_generate_arguments
+
+logger = module_logger(__name__, __spec__)
+
+# pandas, openpyxl and yaml are slow to import, so they are only imported by the
+# subcommands that need them: generate and sql-only load the template with pandas,
+# diff loads the YAML files (and the template, unless two files are given), and
+# validate needs neither.
+
+def generate_command(args):
+    """
+    Run a full generation, as python -m dex_ingestion.main does.
+    """
+    from .main import generate
+
+    return generate(args)
+
+def sql_only_command(args):
+    """
+    Write only the srcl_vw SQL views.
+    """
+    from .excel_processor import iter_excel_rows, process_excel
+    from .utils import load_keyword_set
+    from .yaml_generator import generate_sql_views
+
+    keywords = load_keyword_set(args.keywords_file) if args.keywords_file else None
+    if args.stream:
+        df = iter_excel_rows(args.input, sheet_name=args.sheet)
+    else:
+        df = process_excel(args.input, args.json_folder, sheet_name=args.sheet)
+    count = generate_sql_views(df, args.json_folder, output_dir=args.output_dir, keywords=keywords,
+                               io_workers=args.io_workers, fsync=not args.no_fsync)
+    logger.info("%d SQL views written.", count)
+    return 0
+
+def validate_command(args):
+    """
+    Check the template and the JSON files it references without writing anything.
+    Returns 1 if any error was found.
+    """
+    from .validation import log_problems, sheet_columns, validate_columns
+
+    if not os.path.exists(args.input):
+        logger.error("Excel file '%s' not found.", args.input)
+        return 1
+    try:
+        row_numbers, values, has_header = sheet_columns(args.input, args.sheet)
+    except KeyError as error:
+        logger.error("%s", error.args[0])
+        return 1
+    if not has_header:
+        logger.error("Sheet '%s' is empty.", args.sheet)
+        return 1
+
+    problems = validate_columns(row_numbers, values, args.json_folder, workers=args.workers)
+    errors, warnings = log_problems(problems)
+    logger.info("Checked %d rows: %d errors, %d warnings.", len(row_numbers), errors, warnings)
+    return 1 if errors else 0
+
+def diff_command(args):
+    """
+    List the tasks added, removed or changed since the last run: the tasks of the previously
+    generated YAML files against the tasks generate_yaml would produce now (nothing is written),
+    or, with two YAML files given, the tasks of the first file against those of the second.
+    Returns 1 if the tasks differ.
+    """
+    from .task_diff import diff_tasks, index_tasks, load_yaml_tasks, log_diff, write_diff
+
+    if args.files and len(args.files) != 2:
+        logger.error("diff takes either no YAML files or an OLD and a NEW file.")
+        return 2
+
+    if args.files:
+        old_tasks = load_yaml_tasks(args.files[0])
+        new_tasks = load_yaml_tasks(args.files[1])
+    else:
+        from .excel_processor import iter_excel_rows, process_excel
+        from .sizing import SizingEngine
+        from .utils import load_keyword_set
+        from .yaml_generator import plan_tasks
+
+        old_tasks = load_yaml_tasks(args.db_yaml)
+        old_tasks.update(load_yaml_tasks(args.ogg_yaml))
+
+        keywords = load_keyword_set(args.keywords_file) if args.keywords_file else None
+        if args.stream:
+            df = iter_excel_rows(args.input, sheet_name=args.sheet)
+        else:
+            df = process_excel(args.input, args.json_folder, sheet_name=args.sheet)
+        sizing = SizingEngine() if args.sizing else None
+        db_tasks, ogg_tasks = plan_tasks(df, args.json_folder, manifest_path=None if args.no_manifest else args.manifest,
+                                         output_dir=args.output_dir, keywords=keywords, sizing=sizing)
+        new_tasks = index_tasks(db_tasks + ogg_tasks, "the template")
+
+    diff = diff_tasks(old_tasks, new_tasks)
+    log_diff(diff)
+    if args.output:
+        write_diff(diff, args.output)
+        logger.info("Task diff written to '%s'.", args.output)
+    return 1 if diff["added"] or diff["removed"] or diff["changed"] else 0
+
+def add_input_arguments(parser):
+    """
+    Add the template and JSON folder options shared by the sql-only, validate and diff subcommands.
+    """
+    parser.add_argument("--input", default="DEX-Table_Ingestion_Template-V1.xlsx", help="Ingestion template workbook (default: DEX-Table_Ingestion_Template-V1.xlsx)")
+    parser.add_argument("--sheet", default=SHEET_NAME, help=f"Sheet holding the tables (default: '{SHEET_NAME}')")
+    parser.add_argument("--json-folder", default="srcl", help="Folder containing the JSON files (default: srcl)")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m dex_ingestion.cli", description="DEX ingestion YAML and SQL generator.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Generate the YAML files, SQL views, enriched JSON and temp copies")
+    add_generate_arguments(generate_parser)
+    generate_parser.set_defaults(handler=generate_command)
+
+    sql_parser = subparsers.add_parser("sql-only", help="Write only the srcl_vw SQL views")
+    add_input_arguments(sql_parser)
+    sql_parser.add_argument("--output-dir", help="Write the srcl_vw folder here instead of next to the JSON folder")
+    sql_parser.add_argument("--stream", action="store_true", help="Stream the Excel rows in read-only mode instead of loading a DataFrame")
+    sql_parser.add_argument("--keywords-file", help="Rename columns matching the keywords in this file instead of the Redshift keywords")
+    sql_parser.add_argument("--io-workers", type=int, default=4, help="Number of background threads writing the SQL files (default: 4)")
+    sql_parser.add_argument("--no-fsync", action="store_true", help="Do not fsync the written files")
+    sql_parser.set_defaults(handler=sql_only_command)
+
+    validate_parser = subparsers.add_parser("validate", help="Check the template and its JSON files without writing anything")
+    add_input_arguments(validate_parser)
+    validate_parser.add_argument("--workers", type=int, default=8, help="Number of threads reading and parsing the JSON files (default: 8)")
+    validate_parser.set_defaults(handler=validate_command)
+
+    diff_parser = subparsers.add_parser("diff", help="List the tasks that changed since the YAML files were generated")
+    diff_parser.add_argument("files", nargs="*", metavar="OLD NEW", help="Compare these two YAML files instead of the previous outputs and the template")
+    add_input_arguments(diff_parser)
+    diff_parser.add_argument("--db-yaml", default="DBtoRedshift.yml", help="Previously generated DBtoRedshift file or shard folder (default: DBtoRedshift.yml)")
+    diff_parser.add_argument("--ogg-yaml", default="OGGToRedshift.yml", help="Previously generated OGGToRedshift file or shard folder (default: OGGToRedshift.yml)")
+    diff_parser.add_argument("--output-dir", help="The --output-dir the files are generated with (the srcl folder is then read as is)")
+    diff_parser.add_argument("--stream", action="store_true", help="Stream the Excel rows in read-only mode instead of loading a DataFrame")
+    diff_parser.add_argument("--keywords-file", help="Rename columns matching the keywords in this file instead of the Redshift keywords")
+    diff_parser.add_argument("--manifest", default=".dex_build_manifest.pkl", help="Build manifest of the last run, whose tasks unchanged rows keep (default: .dex_build_manifest.pkl)")
+    diff_parser.add_argument("--no-manifest", action="store_true", help="Build every task from the JSON files, as generate --force does")
+    diff_parser.add_argument("--sizing", action="store_true", help="The files are generated with --sizing")
+    diff_parser.add_argument("--output", help="Also write the diff as JSON to this file")
+    diff_parser.set_defaults(handler=diff_command)
+
+    # generate has its own --log-level option
+    for subparser in (sql_parser, validate_parser, diff_parser):
+        subparser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Log level (default: INFO)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    configure_logging(args.log_level)
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
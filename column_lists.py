@@ -0,0 +1,62 @@
+# column_lists.py
+
+from itertools import chain
+
+class ColumnList:
+    """
+    Read-only column_list of a task: the table's own column names, a tuple shared by every
+    task of the table, followed by a suffix tuple of injected audit/OGG column names that is
+    shared by every table (see yaml_generator.table_column_lists).
+
+    Iterates, indexes and compares equal like a list or tuple of the same names. The YAML
+    task writers write it as a plain sequence, in full for every task that references it
+    (see yaml_emitter.TaskDumper), so the files are the same as with separate lists.
+    """
+
+    __slots__ = ("columns", "suffix")
+
+    def __init__(self, columns, suffix=()):
+        self.columns = columns
+        self.suffix = suffix
+
+    def __len__(self):
+        return len(self.columns) + len(self.suffix)
+
+    def __iter__(self):
+        return chain(self.columns, self.suffix)
+
+    def __contains__(self, name):
+        return name in self.columns or name in self.suffix
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return list(self)[position]
+        if position < 0:
+            position += len(self)
+            if position < 0:
+                raise IndexError("ColumnList index out of range")
+        if position < len(self.columns):
+            return self.columns[position]
+        return self.suffix[position - len(self.columns)]
+
+    def __eq__(self, other):
+        if not isinstance(other, (ColumnList, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(name == other_name for name, other_name in zip(self, other))
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ColumnList({list(self)!r})"
+
+    def __reduce__(self):
+        # Pickled (e.g. in the build manifest) as its two tuples, so shared tuples are stored once
+        return ColumnList, (self.columns, self.suffix)
+
+def json_default(value):
+    """
+    json.dumps default for task dicts: ColumnLists become lists, anything else its str().
+    """
+    if isinstance(value, ColumnList):
+        return list(value)
+    return str(value)
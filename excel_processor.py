@@ -1,35 +1,93 @@
 # excel_processor.py
 
-import pandas as pd
+import logging
 from .utils import rename_column_if_keyword
 
-def process_excel(input_excel, json_folder):
+logger = logging.getLogger(__name__)
+
+# Sheet of the ingestion template that holds one row per table
+SHEET_NAME = "Ingestion Details"
+
+# Normalised names of the columns generate_yaml reads
+USED_COLUMNS = (
+    "source table name",
+    "source system name",
+    "data refresh frequency",
+    "json file",
+    "table classification",
+    "is pii [y/n]",
+    "is spii [y/n]",
+    "pii column name",
+    "spii column name",
+    "source system database name",
+    "source system db type",
+    "task2",
+    "source table size (gb)",
+    "reliable date column",
+    "table archived (y/n)",
+    "source archival/history schema name",
+    "source archival/history table name",
+    "source table pk",
+)
+
+def normalize_header(header):
+    """
+    Strip a column header, collapse repeated whitespace (including hidden characters)
+    and convert it to lowercase for case-insensitive access.
+    """
+    return " ".join(str(header).split()).lower()
+
+def process_excel(input_excel, json_folder, sheet_name=SHEET_NAME):
+    # pandas is imported here so that importing this module (e.g. for the CLI) stays fast
+    import pandas as pd
+
     # Read Excel file
-    df = pd.read_excel(input_excel, engine="openpyxl", sheet_name="Ingestion Details")
+    df = pd.read_excel(input_excel, engine="openpyxl", sheet_name=sheet_name)
 
-    # Debug: Print column names to verify
-    print("Columns in the Excel file:")
-    print(df.columns)
+    # Normalise the column names in a single pass
+    df.columns = [normalize_header(column) for column in df.columns]
 
-    # Strip any leading/trailing spaces from column names
-    df.columns = df.columns.str.strip()
+    # Debug: Log column names to verify
+    logger.debug("Columns in the Excel file:\n%s", df.columns)
 
-    # Debug: Print column names after stripping spaces
-    print("Columns after stripping spaces:")
-    print(df.columns)
+    return df
 
-    # Replace multiple spaces with a single space (in case of hidden characters)
-    df.columns = df.columns.str.replace(r'\s+', ' ', regex=True)
+def iter_excel_rows(input_excel, sheet_name=SHEET_NAME, columns=USED_COLUMNS):
+    """
+    Stream the rows of the ingestion sheet without loading it into a DataFrame.
+    Yields (index, record) pairs like DataFrame.iterrows(), one at a time, where each record
+    is a dict of the requested normalised columns only; the other columns are never kept.
+    """
+    from openpyxl import load_workbook
 
-    # Debug: Print column names after replacing spaces
-    print("Columns after replacing spaces:")
-    print(df.columns)
+    workbook = load_workbook(input_excel, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
 
-    # Convert column names to lowercase for case-insensitive access
-    df.columns = df.columns.str.lower()
+        # Map each requested column to its position in the sheet
+        positions = {}
+        for position, column in enumerate(header):
+            if column is None:
+                continue
+            name = normalize_header(column)
+            if name in columns and name not in positions:
+                positions[name] = position
 
-    # Debug: Print column names after converting to lowercase
-    print("Columns after converting to lowercase:")
-    print(df.columns)
+        missing = [column for column in columns if column not in positions]
+        if missing:
+            logger.warning("Columns not found in sheet '%s': %s", sheet_name, missing)
 
-    return df
\ No newline at end of file
+        for index, values in enumerate(rows):
+            # Skip blank rows (read-only sheets often report trailing empty rows)
+            if all(value is None for value in values):
+                continue
+            record = {}
+            for column in columns:
+                position = positions.get(column)
+                record[column] = values[position] if position is not None and position < len(values) else None
+            yield index, record
+    finally:
+        workbook.close()
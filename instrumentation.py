@@ -0,0 +1,169 @@
+# instrumentation.py
+
+import contextlib
+import json
+import logging
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Parent logger of all the package's module loggers
+LOGGER_NAME = __name__.rpartition(".")[0] or "dex_ingestion"
+
+class ConsoleFormatter(logging.Formatter):
+    """
+    Format log records like the print() messages they replaced: warnings and errors
+    get a "Warning: "/"Error: " prefix, everything else is printed as is.
+    """
+
+    PREFIXES = {
+        logging.WARNING: "Warning: ",
+        logging.ERROR: "Error: ",
+        logging.CRITICAL: "Error: ",
+    }
+
+    def format(self, record):
+        return self.PREFIXES.get(record.levelno, "") + super().format(record)
+
+def configure_logging(level="INFO", stream=None):
+    """
+    Send the package's log messages to stdout (or stream) at the given level, e.g. "DEBUG"
+    for the per-row messages. Messages below the level are never formatted.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(ConsoleFormatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    return logger
+
+def module_logger(name, spec=None):
+    """
+    Return the logger of a module given its __name__ and __spec__. Under "python -m" its
+    __name__ is "__main__", so it logs under the module name for configure_logging to apply.
+    """
+    return logging.getLogger(spec.name if name == "__main__" and spec is not None else name)
+
+def peak_rss_bytes():
+    """
+    Return the peak resident set size of the process in bytes, or None where it is not available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def io_totals(io_stats):
+    """
+    Return the total (reads, writes) of an IOStats over all stages.
+    """
+    reads = writes = 0
+    for counts in io_stats.counts.values():
+        reads += counts["reads"]
+        writes += counts["writes"]
+    return reads, writes
+
+class RunReport:
+    """
+    Record the wall time, CPU time, memory and file counts of each pipeline stage and of
+    each table, and write them as a JSON run report.
+    With trace_memory, tracemalloc is started and the peak traced (Python heap) memory of
+    each stage is recorded as well; this slows the run down noticeably, so it is off by default.
+    The peak RSS of the process is always recorded where the platform reports it.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.stages = {}
+        self.tables = []
+        if trace_memory:
+            # Only imported when used, like platform below, to keep the CLI start-up fast
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name, io_stats=None):
+        """
+        Time a stage. With an IOStats, the reads and writes it counts during the stage are recorded too.
+        Stages run more than once accumulate their times and counts.
+        """
+        if self.trace_memory:
+            import tracemalloc
+
+            # reset_peak is new in Python 3.9; before that the peak is the highest since tracing started
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+        reads_before, writes_before = io_totals(io_stats) if io_stats is not None else (0, 0)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "reads": 0, "writes": 0})
+            stage["wall_seconds"] += time.perf_counter() - start_wall
+            stage["cpu_seconds"] += time.process_time() - start_cpu
+            if io_stats is not None:
+                reads, writes = io_totals(io_stats)
+                stage["reads"] += reads - reads_before
+                stage["writes"] += writes - writes_before
+            if self.trace_memory:
+                stage["peak_traced_bytes"] = max(stage.get("peak_traced_bytes", 0), tracemalloc.get_traced_memory()[1])
+
+    def add_table(self, row, timing, io_stats):
+        """
+        Record the time and file counts of one processed row (a TableRow) from its RowResult fields.
+        """
+        reads, writes = io_totals(io_stats)
+        wall_seconds, cpu_seconds = timing
+        self.tables.append({
+            "row": row.index + 1,
+            "table": row.table_name if isinstance(row.table_name, str) else None,
+            "json_file": row.json_file if isinstance(row.json_file, str) else None,
+            "wall_seconds": round(wall_seconds, 6),
+            "cpu_seconds": round(cpu_seconds, 6),
+            "reads": reads,
+            "writes": writes,
+        })
+
+    def to_dict(self, summary=None):
+        """
+        Return the report as a JSON-serialisable dict, with the run summary of generate_yaml if given.
+        """
+        import platform
+
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = dict(stage, wall_seconds=round(stage["wall_seconds"], 4), cpu_seconds=round(stage["cpu_seconds"], 4))
+        report = {
+            "started": self.started,
+            "argv": sys.argv,
+            "python": platform.python_version(),
+            "wall_seconds": round(time.perf_counter() - self.start_wall, 4),
+            "cpu_seconds": round(time.process_time() - self.start_cpu, 4),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "stages": stages,
+            "tables": self.tables,
+        }
+        if summary is not None:
+            report["summary"] = summary
+        return report
+
+    def write(self, report_path, summary=None):
+        """
+        Write the report as JSON to report_path.
+        """
+        with open(report_path, "w") as report_file:
+            json.dump(self.to_dict(summary), report_file, indent=4, default=str)
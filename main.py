@@ -1,19 +1,113 @@
 # main.py
 
-from .excel_processor import process_excel
-from .yaml_generator import generate_yaml
+import argparse
+import cProfile
+import sys
 
-def main():
-    input_excel = "DEX-Table_Ingestion_Template-V1.xlsx"  # Updated input file
+from .instrumentation import RunReport, configure_logging, module_logger
+from .utils import load_keyword_set
+
+logger = module_logger(__name__, __spec__)
+
+def add_generate_arguments(parser):
+    """
+    Add the options of a full generation run to an argparse parser (shared with cli.py generate).
+    """
+    parser.add_argument("--input", default="DEX-Table_Ingestion_Template-V1.xlsx", help="Ingestion template workbook (default: DEX-Table_Ingestion_Template-V1.xlsx)")
+    parser.add_argument("--json-folder", default="srcl", help="Folder containing the JSON files (default: srcl)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of parallel workers for per-table processing (default: 1, serial)")
+    parser.add_argument("--processes", action="store_true", help="Use a process pool instead of a thread pool when --workers > 1")
+    parser.add_argument("--output-dir", help="Leave the srcl folder untouched and write the enriched JSON, srcl_vw and temp folders here")
+    parser.add_argument("--stream", action="store_true", help="Stream the Excel rows in read-only mode instead of loading a DataFrame")
+    parser.add_argument("--force", action="store_true", help="Ignore the build manifest and regenerate every table")
+    parser.add_argument("--io-workers", type=int, default=4, help="Number of background threads writing the JSON and SQL files (default: 4)")
+    parser.add_argument("--no-fsync", action="store_true", help="Do not fsync the written files (faster, but a crash may lose recent writes)")
+    parser.add_argument("--temp-all-files", action="store_true", help="Also copy the srcl JSON files that no Excel row references into the temp folder")
+    parser.add_argument("--temp-links", choices=["copy", "symlink", "hardlink"], default="copy",
+                        help="How to put tables whose schemaName needs no change into the temp folder (default: copy)")
+    parser.add_argument("--keywords-file", help="Rename columns matching the keywords in this file (JSON list or one per line) instead of the Redshift keywords")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Log level; DEBUG adds the per-row and per-file messages (default: INFO)")
+    parser.add_argument("--report", default="dex_run_report.json", help="Write the JSON run report (stage and table timings) here (default: dex_run_report.json)")
+    parser.add_argument("--trace-memory", action="store_true", help="Record the peak traced memory of each stage in the run report (slower)")
+    parser.add_argument("--profile", help="Profile the run with cProfile and write the stats to this file")
+    parser.add_argument("--no-validate", action="store_true", help="Skip the pre-flight validation of the template and the JSON files")
+    parser.add_argument("--shard-by", choices=["system", "source_db", "frequency", "size"],
+                        help="Write the tasks to one YAML file per source system, source_db, refresh frequency or --shard-size tasks, in DBtoRedshift/ and OGGToRedshift/ folders")
+    parser.add_argument("--shard-size", type=int, default=1000, help="Number of tasks per shard with --shard-by size (default: 1000)")
+    parser.add_argument("--sizing", action="store_true",
+                        help="Size source_predicate_count from the table size and column types, and set the recommended column encodings in the temp JSON files")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate DBtoRedshift/OGGToRedshift YAML and SQL views from the DEX ingestion template.")
+    add_generate_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args.log_level)
+    return generate(args)
+
+def generate(args):
+    """
+    Run a full generation with the parsed options and write its run report.
+    Returns the exit status: 1 if the validation found errors and nothing was written.
+    """
+    from .validation import ValidationError
+
+    report = RunReport(trace_memory=args.trace_memory)
+
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        summary = run(args, report)
+    except ValidationError as error:
+        logger.error("Validation failed: %s. Nothing was written.", error)
+        report.write(args.report, {"validation": [problem._asdict() for problem in error.problems]})
+        return 1
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            logger.info("Profile written to '%s'.", args.profile)
+
+    report.write(args.report, summary)
+    logger.info("Run report written to '%s'.", args.report)
+    return 0
+
+def run(args, report):
+    # pandas, openpyxl and yaml are only imported once a run starts
+    from .excel_processor import iter_excel_rows, process_excel
+    from .sizing import SizingEngine
+    from .yaml_generator import generate_yaml
+
+    input_excel = args.input  # Updated input file
     output_yaml = "DBtoRedshift.yml"  # DBtoRedshift tasks
     output_yaml2 = "OGGToRedshift.yml"  # OGGToRedshift tasks
-    json_folder = "srcl"  # Folder containing JSON files
+    json_folder = args.json_folder  # Folder containing JSON files
+    manifest_path = ".dex_build_manifest.pkl"  # Incremental rebuild cache
+
+    # Reserved keywords of the target warehouse (Redshift unless a keywords file is given)
+    keywords = load_keyword_set(args.keywords_file) if args.keywords_file else None
+
+    # Extract sizing and column encodings from the column types (opt-in)
+    sizing = SizingEngine() if args.sizing else None
 
     # Process the Excel file
-    df = process_excel(input_excel, json_folder)
+    with report.stage("read_excel"):
+        if args.stream:
+            df = iter_excel_rows(input_excel)
+        else:
+            df = process_excel(input_excel, json_folder)
 
     # Generate YAML files
-    generate_yaml(df, output_yaml, output_yaml2, json_folder)
+    return generate_yaml(df, output_yaml, output_yaml2, json_folder, workers=args.workers, use_processes=args.processes,
+                  manifest_path=manifest_path, force=args.force, output_dir=args.output_dir, keywords=keywords,
+                  io_workers=args.io_workers, fsync=not args.no_fsync, temp_all_files=args.temp_all_files,
+                  temp_links=args.temp_links, report=report, validate_first=not args.no_validate,
+                  shard_by=args.shard_by, shard_size=args.shard_size, sizing=sizing)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
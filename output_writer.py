@@ -0,0 +1,237 @@
+# output_writer.py
+
+import filecmp
+import locale
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+def temp_path_for(file_path):
+    """
+    Return a temporary path next to file_path, unique to this process and thread,
+    so the final rename stays on the same file system.
+    """
+    folder, file_name = os.path.split(file_path)
+    return os.path.join(folder, f".{file_name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def fsync_path(path):
+    """
+    Flush a file or a folder to disk. Folders cannot be opened on Windows, which is ignored.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def text_size(content):
+    """
+    Return the size in bytes of content (a str) once written to a file in text mode,
+    or None if it cannot be encoded.
+    """
+    try:
+        size = len(content.encode(locale.getpreferredencoding(False)))
+    except UnicodeEncodeError:
+        return None
+    # Text mode writes os.linesep for every "\n"
+    return size + content.count("\n") * (len(os.linesep) - 1)
+
+def content_unchanged(file_path, content, stats=None):
+    """
+    Return True if file_path exists and already holds content (a str, compared in text mode).
+    Symbolic links are never considered unchanged, so writing a file replaces the link.
+    The file is only read if it has the size content would have; if stats (a dict) is given,
+    its "compared" count is incremented for each file read.
+    """
+    try:
+        if os.path.islink(file_path) or os.path.getsize(file_path) != text_size(content):
+            return False
+    except OSError:
+        return False
+    if stats is not None:
+        stats["compared"] += 1
+    try:
+        with open(file_path, "r") as existing_file:
+            return existing_file.read() == content
+    except (OSError, UnicodeDecodeError):
+        return False
+
+def replace_if_changed(temp_path, file_path, fsync=True):
+    """
+    Move a fully written temp file over file_path, or drop it if file_path already has the
+    same content. Returns True if file_path was replaced.
+    """
+    if os.path.exists(file_path) and filecmp.cmp(temp_path, file_path, shallow=False):
+        os.remove(temp_path)
+        return False
+    if fsync:
+        fsync_path(temp_path)
+    os.replace(temp_path, file_path)
+    if fsync:
+        fsync_path(os.path.dirname(os.path.abspath(file_path)))
+    return True
+
+def write_file(file_path, content, fsync=False):
+    """
+    Write content (a str) to file_path through a temp file and a rename, unless the file
+    already holds the same content. Returns True if the file was written.
+    """
+    if content_unchanged(file_path, content):
+        return False
+    temp_path = temp_path_for(file_path)
+    try:
+        with open(temp_path, "w") as temp_file:
+            temp_file.write(content)
+        if fsync:
+            fsync_path(temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if fsync:
+        fsync_path(os.path.dirname(os.path.abspath(file_path)))
+    return True
+
+def link_file(src_path, file_path, kind="symlink"):
+    """
+    Make file_path a symbolic link (with a relative target) or a hard link to src_path,
+    replacing whatever is there atomically. Returns True if file_path was changed.
+    """
+    if kind == "symlink":
+        target = os.path.relpath(src_path, os.path.dirname(os.path.abspath(file_path)))
+        if os.path.islink(file_path) and os.readlink(file_path) == target:
+            return False
+    else:
+        if os.path.exists(file_path) and not os.path.islink(file_path) and os.path.samefile(src_path, file_path):
+            return False
+
+    temp_path = temp_path_for(file_path)
+    if kind == "symlink":
+        os.symlink(target, temp_path)
+    else:
+        os.link(src_path, temp_path)
+    try:
+        os.replace(temp_path, file_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return True
+
+class OutputWriter:
+    """
+    Write generated files (SQL views, JSON metadata) from a pool of background threads.
+
+    Files are queued with submit() and written in batches of batch_size by the pool.
+    Each file is written to a temp file next to it and renamed over the target, so a
+    reader never sees a partial file. Files that already hold the same content are left
+    alone; telling them apart reads the existing files that have the same size as the new
+    content ("compared" in the stats). With fsync, the files of a batch are flushed to disk
+    together at the end of the batch, before they are renamed, and each folder is flushed once per batch.
+    A file submitted more than once ends up with the content submitted last.
+    """
+
+    def __init__(self, workers=4, batch_size=256, fsync=True):
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="output_writer")
+        self.pending = {}
+        self.futures = []
+        self.path_futures = {}
+        self.lock = threading.Lock()
+        self.stats = {"written": 0, "unchanged": 0, "compared": 0, "bytes": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.executor.shutdown(wait=True)
+
+    def submit(self, file_path, content):
+        """
+        Queue content (a str) to be written to file_path. Safe to call from several threads.
+        """
+        with self.lock:
+            self.pending[file_path] = content
+            if len(self.pending) >= self.batch_size:
+                self._submit_batch()
+
+    def _submit_batch(self):
+        # Called with self.lock held
+        if self.pending:
+            # A batch rewriting a file waits for the earlier batch that wrote it
+            depends_on = {self.path_futures[file_path] for file_path in self.pending if file_path in self.path_futures}
+            future = self.executor.submit(self._write_batch, list(self.pending.items()), depends_on)
+            for file_path in self.pending:
+                self.path_futures[file_path] = future
+            self.futures.append(future)
+            self.pending = {}
+
+    def _write_batch(self, batch, depends_on=()):
+        # The batches depended on were submitted earlier, so they are already running or done
+        for future in depends_on:
+            future.result()
+
+        written = []
+        unchanged = 0
+        size = 0
+        counts = {"compared": 0}
+        try:
+            for file_path, content in batch:
+                if content_unchanged(file_path, content, counts):
+                    unchanged += 1
+                    continue
+                temp_path = temp_path_for(file_path)
+                written.append((temp_path, file_path))
+                with open(temp_path, "w") as temp_file:
+                    temp_file.write(content)
+                size += len(content)
+
+            if self.fsync:
+                for temp_path, _ in written:
+                    fsync_path(temp_path)
+            for temp_path, file_path in written:
+                os.replace(temp_path, file_path)
+            if self.fsync:
+                for folder in {os.path.dirname(os.path.abspath(file_path)) for _, file_path in written}:
+                    fsync_path(folder)
+        except BaseException:
+            for temp_path, _ in written:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            raise
+
+        with self.lock:
+            self.stats["written"] += len(written)
+            self.stats["unchanged"] += unchanged
+            self.stats["compared"] += counts["compared"]
+            self.stats["bytes"] += size
+
+    def wait(self):
+        """
+        Write everything queued so far and wait until it is on disk.
+        Re-raises the first error of a background write.
+        """
+        with self.lock:
+            self._submit_batch()
+            futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """
+        Write the remaining files, stop the pool and return the write statistics.
+        """
+        try:
+            self.wait()
+        finally:
+            self.executor.shutdown(wait=True)
+        return dict(self.stats)
@@ -0,0 +1,209 @@
+# row_records.py
+
+import pickle
+import tempfile
+
+import pandas as pd
+
+class TableRow:
+    """
+    One row of the ingestion template with its derived fields precomputed by prepare_rows.
+    Missing derived values are None; the raw values are kept as they were in the sheet.
+    """
+
+    __slots__ = (
+        "index",
+        "table_name",
+        "schema_name",
+        "table_name_without_schema",
+        "target_table",
+        "task_id",
+        "ogg_task_id",
+        "json_file",
+        "table_classification",
+        "is_pii",
+        "is_spii",
+        "pii_column_name",
+        "spii_column_name",
+        "source_db",
+        "source_type",
+        "is_sybase",
+        "is_ogg",
+        "is_large",
+        "reliable_date_column",
+        "is_archived",
+        "hist_source_schema",
+        "hist_source_table",
+        "primary_keys",
+        "table_size_gb",
+    )
+
+    def __init__(self, index, table_name, schema_name, table_name_without_schema,
+                 target_table, task_id, ogg_task_id, json_file,
+                 table_classification, is_pii, is_spii, pii_column_name,
+                 spii_column_name, source_db, source_type, is_sybase,
+                 is_ogg, is_large, reliable_date_column, is_archived,
+                 hist_source_schema, hist_source_table, primary_keys, table_size_gb):
+        self.index = index
+        self.table_name = table_name
+        self.schema_name = schema_name
+        self.table_name_without_schema = table_name_without_schema
+        self.target_table = target_table
+        self.task_id = task_id
+        self.ogg_task_id = ogg_task_id
+        self.json_file = json_file
+        self.table_classification = table_classification
+        self.is_pii = is_pii
+        self.is_spii = is_spii
+        self.pii_column_name = pii_column_name
+        self.spii_column_name = spii_column_name
+        self.source_db = source_db
+        self.source_type = source_type
+        self.is_sybase = is_sybase
+        self.is_ogg = is_ogg
+        self.is_large = is_large
+        self.reliable_date_column = reliable_date_column
+        self.is_archived = is_archived
+        self.hist_source_schema = hist_source_schema
+        self.hist_source_table = hist_source_table
+        self.primary_keys = primary_keys
+        self.table_size_gb = table_size_gb
+
+    def items(self):
+        """
+        Return (field, value) pairs, e.g. for hashing the row.
+        """
+        return [(name, getattr(self, name)) for name in self.__slots__ if name != "index"]
+
+def _as_text(series):
+    """
+    Return a column as a nullable string Series; values that are not strings become missing.
+    """
+    is_text = series.map(lambda value: isinstance(value, str), na_action="ignore").fillna(False).astype(bool)
+    return series.where(is_text).astype("string")
+
+def _to_list(series):
+    """
+    Return the values of a derived column as a list of Python objects, with None for missing values.
+    """
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def prepare_rows(df):
+    """
+    Compute the derived fields of every row with whole-column pandas operations
+    and return them as a list of TableRow records, in DataFrame order.
+    """
+    index = df.index.tolist()
+    df = df.reset_index(drop=True)
+
+    # Split the table name to get schema and table; names without a '.' are invalid
+    table_names = _as_text(df["source table name"])
+    split_names = table_names.str.split(".", n=1, expand=True).reindex(columns=[0, 1])
+    schema_names = split_names[0].where(split_names[1].notna())
+    tables_without_schema = split_names[1]
+
+    # Create the target_table by prepending the system name
+    target_tables = df["source system name"].map(str) + "_" + tables_without_schema
+
+    # Create the task_id from the target_table and the refresh frequency ("unknown" if missing)
+    refresh_frequencies = _as_text(df["data refresh frequency"]).fillna("unknown").str.lower()
+    task_ids = "de_etl_" + target_tables + "_" + refresh_frequencies
+    ogg_task_ids = task_ids.str.replace("de_etl_", "de_ogg_", regex=False)
+
+    # Flags used by the task builder
+    is_sybase = _as_text(df["source system db type"]).str.lower().eq("sybase").fillna(False).astype(bool)
+    is_ogg = df["task2"].eq("OGGToRedshift").fillna(False).astype(bool)
+    table_sizes = pd.to_numeric(df["source table size (gb)"], errors="coerce")
+    is_large = table_sizes.gt(10) & df["reliable date column"].notna()
+    is_archived = df["table archived (y/n)"].eq("Y").fillna(False).astype(bool)
+
+    # Extract the history table name without the schema
+    hist_tables = _as_text(df["source archival/history table name"]).str.split(".").str[-1]
+
+    # Handle primary_keys (single or multiple comma-separated values)
+    primary_keys = (
+        _as_text(df["source table pk"])
+        .str.replace(r"\s*,\s*", ",", regex=True)
+        .str.strip()
+        .str.split(",")
+    )
+
+    columns = [
+        index,
+        df["source table name"].tolist(),
+        _to_list(schema_names),
+        _to_list(tables_without_schema),
+        _to_list(target_tables),
+        _to_list(task_ids),
+        _to_list(ogg_task_ids),
+        df["json file"].tolist(),
+        df["table classification"].tolist(),
+        df["is pii [y/n]"].tolist(),
+        df["is spii [y/n]"].tolist(),
+        df["pii column name"].tolist(),
+        df["spii column name"].tolist(),
+        df["source system database name"].tolist(),
+        df["source system db type"].tolist(),
+        is_sybase.tolist(),
+        is_ogg.tolist(),
+        is_large.tolist(),
+        df["reliable date column"].tolist(),
+        is_archived.tolist(),
+        df["source archival/history schema name"].tolist(),
+        _to_list(hist_tables),
+        _to_list(primary_keys),
+        _to_list(table_sizes),
+    ]
+    return [TableRow(*values) for values in zip(*columns)]
+
+def iter_pair_chunks(rows, chunk_size=10000):
+    """
+    Group (index, record) pairs, e.g. from excel_processor.iter_excel_rows, into lists of
+    chunk_size pairs, reading no further ahead than the current chunk.
+    """
+    chunk = []
+    for pair in rows:
+        chunk.append(pair)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def prepare_row_pairs(rows, chunk_size=10000):
+    """
+    Turn (index, record) pairs, e.g. from excel_processor.iter_excel_rows, into TableRow
+    records, running prepare_rows over chunks of chunk_size rows at a time.
+    """
+    for chunk in iter_pair_chunks(rows, chunk_size):
+        yield from prepare_pair_chunk(chunk)
+
+def prepare_pair_chunk(chunk):
+    """
+    Return the TableRow records of a list of (index, record) pairs.
+    """
+    df = pd.DataFrame([record for _, record in chunk], index=[index for index, _ in chunk])
+    return prepare_rows(df)
+
+class RowSpool:
+    """
+    Lists of TableRow records spilled to an anonymous temporary file, so that the rows of a
+    streamed sheet can be gone through again (e.g. checked first, then processed) while only
+    one list is held in memory. Iterates the lists in the order they were appended.
+    """
+
+    def __init__(self):
+        self.spool_file = tempfile.TemporaryFile()
+        self.chunks = 0
+
+    def append(self, rows):
+        pickle.dump(rows, self.spool_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.chunks += 1
+
+    def __iter__(self):
+        self.spool_file.seek(0)
+        for _ in range(self.chunks):
+            yield pickle.load(self.spool_file)
+
+    def close(self):
+        self.spool_file.close()
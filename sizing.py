@@ -0,0 +1,175 @@
+# sizing.py
+
+import logging
+import math
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever TYPE_RULES or the width estimates change, so the build manifest rebuilds every table
+SIZING_VERSION = 2
+
+# Default partitioning of large extracts: one predicate per GB_PER_PREDICATE GB of the table,
+# or per ROWS_PER_PREDICATE estimated rows if that gives more, between MIN_ and MAX_PREDICATES
+GB_PER_PREDICATE = 8
+ROWS_PER_PREDICATE = 50_000_000
+MIN_PREDICATES = 2
+MAX_PREDICATES = 64
+
+# Column type families, matched in order against the start of the lower-cased JSON column type:
+# (pattern, bytes per value, recommended Redshift encoding). The bytes per value of decimals depend
+# on their precision ("decimal"), and those of text and binary types on their declared length,
+# which fixed-length types fill ("fixed") and variable-length ones are assumed to half fill ("varying").
+# AZ64 only supports integer, decimal, date and timestamp types; ZSTD suits every other type.
+TYPE_RULES = [
+    (re.compile(r"bool"), 1, "RAW"),
+    (re.compile(r"timestamp|datetime"), 8, "AZ64"),
+    (re.compile(r"date"), 4, "AZ64"),
+    (re.compile(r"time|interval"), 8, "ZSTD"),
+    (re.compile(r"smallint|tinyint|int2\b"), 2, "AZ64"),
+    (re.compile(r"bigint|int8\b"), 8, "AZ64"),
+    (re.compile(r"int"), 4, "AZ64"),
+    (re.compile(r"numeric|decimal|number"), "decimal", "AZ64"),
+    (re.compile(r"real|float|double|binary_(float|double)"), 8, "ZSTD"),
+    (re.compile(r"n?varchar2?|character varying|text|string|n?clob|varbyte|varbinary|blob"), "varying", "ZSTD"),
+    (re.compile(r"n?char|character|bpchar"), "fixed", "ZSTD"),
+]
+
+# Width of a type no rule matches, and the declared length assumed for text types without one
+UNKNOWN_WIDTH = 16
+DEFAULT_TEXT_LENGTH = 256
+
+DECLARED_SIZE = re.compile(r"\(\s*(\d+|max)", re.IGNORECASE)
+
+def resolve_type(column_type):
+    """
+    Return the estimated bytes per value and the recommended encoding of a JSON column type
+    such as "varchar(255)", "numeric(18,2)" or "TIMESTAMP(6)".
+    Variable-length text is assumed to be half full on average.
+    """
+    type_name = column_type.strip().lower()
+    match = DECLARED_SIZE.search(type_name)
+    declared = None
+    if match:
+        declared = 65535 if match.group(1).lower() == "max" else int(match.group(1))
+
+    for pattern, width, encoding in TYPE_RULES:
+        if not pattern.match(type_name):
+            continue
+        if width == "decimal":
+            # DECIMAL(p, s) is stored in 8 bytes up to 18 digits and in 16 bytes beyond
+            return (8 if declared is not None and declared <= 18 else 16), encoding
+        length = declared if declared is not None else DEFAULT_TEXT_LENGTH
+        if width == "fixed":
+            return length, encoding
+        if width == "varying":
+            return length // 2 + 4, encoding
+        return width, encoding
+    return UNKNOWN_WIDTH, "ZSTD"
+
+class SizingEngine:
+    """
+    Size the extracts of large tables and recommend column encodings from the JSON column types.
+
+    source_predicate_count is computed from the table size in the template and the row width
+    estimated from the column types (see predicate_count), instead of a fixed 20. The encoding
+    recommended for each column's type is returned by recommend_encodings, which leaves the
+    metadata it is given unchanged.
+
+    The profile (bytes per value, encoding) of each distinct type string is resolved once per run
+    and kept in a lookup table. Worker processes get a copy of the lookup table. The engine is
+    shared by the threads of a run (and the jobs of a batch), so the lookup table is only changed
+    under a lock.
+    """
+
+    def __init__(self, gb_per_predicate=GB_PER_PREDICATE, rows_per_predicate=ROWS_PER_PREDICATE,
+                 min_predicates=MIN_PREDICATES, max_predicates=MAX_PREDICATES):
+        self.gb_per_predicate = gb_per_predicate
+        self.rows_per_predicate = rows_per_predicate
+        self.min_predicates = min_predicates
+        self.max_predicates = max_predicates
+        self.profiles = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled for worker processes; each copy gets its own
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @property
+    def version(self):
+        """
+        Identify the sizing rules and settings, e.g. for the build manifest.
+        """
+        return (f"{SIZING_VERSION}:{self.gb_per_predicate}:{self.rows_per_predicate}:"
+                f"{self.min_predicates}:{self.max_predicates}")
+
+    def profile(self, column_type):
+        """
+        Return the (bytes per value, encoding) of a column type, or None if it is not a string.
+        """
+        if not isinstance(column_type, str):
+            return None
+        profile = self.profiles.get(column_type)
+        if profile is None:
+            profile = resolve_type(column_type)
+            with self.lock:
+                self.profiles[column_type] = profile
+        return profile
+
+    def row_bytes(self, columns):
+        """
+        Return the estimated bytes per row of a table's JSON columns, or None if no column has a type.
+        """
+        profiles = [self.profile(column.get("type")) for column in columns]
+        widths = [profile[0] for profile in profiles if profile is not None]
+        return sum(widths) if widths else None
+
+    def predicate_count(self, size_gb, columns):
+        """
+        Return the source_predicate_count of a table of size_gb GB with the given JSON columns:
+        enough predicates that each reads at most gb_per_predicate GB and, if the row width can
+        be estimated, at most rows_per_predicate rows (narrow tables have more rows per GB).
+        """
+        by_size = size_gb / self.gb_per_predicate
+        row_bytes = self.row_bytes(columns)
+        by_rows = size_gb * 2 ** 30 / row_bytes / self.rows_per_predicate if row_bytes else 0
+        return max(self.min_predicates, min(self.max_predicates, math.ceil(max(by_size, by_rows))))
+
+    def recommend_encodings(self, columns):
+        """
+        Return a copy of a table's JSON columns with the "encoding" of every typed column set to
+        the recommended one, or None if they all have it already. The columns are not changed.
+        """
+        recommended = []
+        changed = False
+        for column in columns:
+            profile = self.profile(column.get("type"))
+            if profile is not None and column.get("encoding") != profile[1]:
+                column = dict(column, encoding=profile[1])
+                changed = True
+            recommended.append(column)
+        return recommended if changed else None
+
+    def size_table(self, row, json_data=None):
+        """
+        Return the source_predicate_count of a table from its JSON metadata (if loaded),
+        or None if the table is not partitioned.
+        """
+        if not row.is_large:
+            return None
+        columns = json_data.get("columns", []) if json_data is not None else []
+        return self.predicate_count(row.table_size_gb, columns)
+
+    def stats(self):
+        """
+        Return the number of distinct column types resolved.
+        """
+        with self.lock:
+            return {"types": len(self.profiles)}
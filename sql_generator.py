@@ -1,55 +1,143 @@
 # sql_generator.py
 
+import logging
 import os
-import json
+from .table_metadata import TableMetadata
 
-def generate_sql_file(json_file_path, columns, table_classification, is_pii, is_spii, pii_column_name, spii_column_name, srcl_vw_folder):
+logger = logging.getLogger(__name__)
+
+# CASE statement that masks a PII/SPII column for users outside pii_users_group
+MASK_TEMPLATE = (
+    "CASE \n"
+    "    WHEN user_is_member_of('current_user'()::name, 'pii_users_group'::name) \n"
+    "    THEN cast({column} as VARCHAR) \n"
+    "    ELSE sha2(cast({column} as VARCHAR), 256) \n"
+    "END as {column}"
+)
+
+# The template split around the column name once, so masking a column is a single join
+MASK_PARTS = MASK_TEMPLATE.split("{column}")
+
+def parse_column_names(value):
     """
-    Generate a SQL file with a SELECT statement where each column is on a new line.
-    If the table is classified as "Confidential" and has PII or SPII columns, add a CASE statement for those columns.
+    Return the column names of a "PII Column Name"/"SPII Column Name" cell as a set.
+    The cell may hold a single name or several comma-separated names; missing values give an empty set.
+    """
+    if not isinstance(value, str):
+        return frozenset()
+    return frozenset(name.strip() for name in value.split(",") if name.strip())
+
+def masked_columns(table_classification, is_pii, is_spii, pii_column_name, spii_column_name):
+    """
+    Return the set of columns to mask: the PII and SPII columns of a "Confidential" table
+    flagged as PII or SPII, and an empty set otherwise.
+    """
+    if table_classification == "Confidential" and (is_pii == "Y" or is_spii == "Y"):
+        return parse_column_names(pii_column_name) | parse_column_names(spii_column_name)
+    return frozenset()
+
+def render_view(columns, schema_name, table_name, masked=frozenset()):
+    """
+    Render the SELECT statement of a view with each column on a new line,
+    wrapping the columns in masked in the masking CASE statement.
+    """
+    if masked:
+        select_columns = [column.join(MASK_PARTS) if column in masked else column for column in columns]
+    else:
+        select_columns = columns
+    return "SELECT \n    " + ",\n    ".join(select_columns) + f"\nFROM {schema_name}.{table_name}"
+
+def sql_file_path_for(json_file_path, srcl_vw_folder):
+    """
+    Return the path of the SQL file of a JSON file (same name with a .sql extension in srcl_vw_folder).
     """
-    # Create the SQL file name (same as JSON file name but with .sql extension)
     sql_file_name = os.path.splitext(os.path.basename(json_file_path))[0] + ".sql"
-    sql_file_path = os.path.join(srcl_vw_folder, sql_file_name)
-
-    # Read the JSON file to get schemaName and tableName
-    with open(json_file_path, "r") as json_file:
-        json_data = json.load(json_file)
-        schema_name = json_data.get("schemaName", "srcl")  # Default to "srcl" if schemaName is missing
-        table_name = json_data.get("tableName", "unknown_table")  # Default to "unknown_table" if tableName is missing
-
-    # Initialize the SELECT statement
-    select_columns = []
-
-    # Process each column
-    for column in columns:
-        # Check if the column is PII or SPII and the table is classified as "Confidential"
-        if table_classification == "Confidential" and (is_pii == "Y" or is_spii == "Y"):
-            if column == pii_column_name or column == spii_column_name:
-                # Add the CASE statement for PII/SPII columns
-                case_statement = (
-                    f"CASE \n"
-                    f"    WHEN user_is_member_of('current_user'()::name, 'pii_users_group'::name) \n"
-                    f"    THEN cast({column} as VARCHAR) \n"
-                    f"    ELSE sha2(cast({column} as VARCHAR), 256) \n"
-                    f"END as {column}"
-                )
-                select_columns.append(case_statement)
+    return os.path.join(srcl_vw_folder, sql_file_name)
+
+def render_table_view(json_file_path, columns, table_classification, is_pii, is_spii, pii_column_name, spii_column_name, srcl_vw_folder,
+                      metadata=None, io_stats=None):
+    """
+    Render the SQL view of a table without writing it. Returns (sql_file_path, select_statement).
+    Pass the already loaded TableMetadata as metadata to avoid reading the JSON file again.
+    """
+    # Read the JSON file to get schemaName and tableName, unless it is already loaded
+    if metadata is None:
+        metadata = TableMetadata.load(json_file_path, io_stats, stage="sql")
+
+    masked = masked_columns(table_classification, is_pii, is_spii, pii_column_name, spii_column_name)
+    select_statement = render_view(columns, metadata.schema_name, metadata.table_name, masked)
+    return sql_file_path_for(json_file_path, srcl_vw_folder), select_statement
+
+class SqlViewWriter:
+    """
+    Collect rendered SQL views and write them in batches of batch_size files,
+    printing one line per batch instead of one per file. With an output_writer.OutputWriter
+    as output, the batches are handed to its background pool instead of written here.
+    """
+
+    def __init__(self, srcl_vw_folder, batch_size=1000, io_stats=None, output=None):
+        self.srcl_vw_folder = srcl_vw_folder
+        self.batch_size = batch_size
+        self.io_stats = io_stats
+        self.output = output
+        self.pending = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, sql_file_path, select_statement):
+        """
+        Queue a view for writing; the batch is written once batch_size views are queued.
+        """
+        self.pending.append((sql_file_path, select_statement))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the queued views.
+        """
+        if not self.pending:
+            return
+        for sql_file_path, select_statement in self.pending:
+            if self.output is not None:
+                self.output.submit(sql_file_path, select_statement)
             else:
-                # Add the column as is
-                select_columns.append(column)
-        else:
-            # Add the column as is
-            select_columns.append(column)
+                with open(sql_file_path, "w") as sql_file:
+                    sql_file.write(select_statement)
+        if self.io_stats is not None:
+            self.io_stats.add("sql", "writes", len(self.pending))
+        self.count += len(self.pending)
+        logger.info("%d SQL files queued for '%s' (%d so far).", len(self.pending), self.srcl_vw_folder, self.count)
+        self.pending = []
 
-    # Join the columns with each on a new line
-    select_columns_formatted = ",\n    ".join(select_columns)
+    def close(self):
+        """
+        Write the remaining views and return the number of files written.
+        """
+        self.flush()
+        return self.count
 
-    # Create the final SELECT statement
-    select_statement = f"SELECT \n    {select_columns_formatted}\nFROM {schema_name}.{table_name}"
+def generate_sql_file(json_file_path, columns, table_classification, is_pii, is_spii, pii_column_name, spii_column_name, srcl_vw_folder,
+                      metadata=None, io_stats=None):
+    """
+    Generate a SQL file with a SELECT statement where each column is on a new line.
+    If the table is classified as "Confidential" and has PII or SPII columns, add a CASE statement for those columns.
+    Pass the already loaded TableMetadata as metadata to avoid reading the JSON file again.
+    """
+    sql_file_path, select_statement = render_table_view(
+        json_file_path, columns, table_classification, is_pii, is_spii, pii_column_name, spii_column_name, srcl_vw_folder,
+        metadata=metadata, io_stats=io_stats
+    )
 
     # Write the SELECT statement to the SQL file
     with open(sql_file_path, "w") as sql_file:
         sql_file.write(select_statement)
+    if io_stats is not None:
+        io_stats.add("sql", "writes")
 
-    print(f"SQL file '{sql_file_name}' created successfully in '{srcl_vw_folder}'!")
\ No newline at end of file
+    logger.info("SQL file '%s' created successfully in '%s'!", os.path.basename(sql_file_path), srcl_vw_folder)
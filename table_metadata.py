@@ -0,0 +1,170 @@
+# table_metadata.py
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# The top-level schemaName line of a srcl table as written by save() (json.dumps with
+# indent=4); nested keys are indented further and newlines inside strings are escaped
+SRCL_SCHEMA_LINE = '\n    "schemaName": "srcl"'
+TEMP_SCHEMA_LINE = '\n    "schemaName": "temp"'
+
+class IOStats:
+    """
+    Count the file reads and writes done by each pipeline stage.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, stage, kind, count=1):
+        stage_counts = self.counts.setdefault(stage, {"reads": 0, "writes": 0})
+        stage_counts[kind] += count
+
+    def merge(self, other):
+        for stage, stage_counts in other.counts.items():
+            for kind, count in stage_counts.items():
+                self.add(stage, kind, count)
+
+    def summary(self):
+        """
+        Return the per-stage counts as a dict, e.g. {"yaml": {"reads": 1, "writes": 1}}.
+        """
+        return {stage: dict(stage_counts) for stage, stage_counts in self.counts.items()}
+
+class TableMetadata:
+    """
+    The JSON metadata of one table, loaded once and shared by the YAML, SQL and temp stages.
+    """
+
+    def __init__(self, file_name, data):
+        self.file_name = file_name
+        self.data = data
+        self.json_text = None  # The JSON text last written for this table, if any
+        self.temp_columns = None  # The columns of the temp copy, if they differ from the table's
+
+    @classmethod
+    def load(cls, json_file_path, io_stats=None, stage="yaml"):
+        with open(json_file_path, "r") as json_file:
+            data = json.load(json_file)
+        if io_stats is not None:
+            io_stats.add(stage, "reads")
+        return cls(os.path.basename(json_file_path), data)
+
+    @property
+    def schema_name(self):
+        return self.data.get("schemaName", "srcl")  # Default to "srcl" if schemaName is missing
+
+    @property
+    def table_name(self):
+        return self.data.get("tableName", "unknown_table")  # Default to "unknown_table" if tableName is missing
+
+    @property
+    def columns(self):
+        return self.data.get("columns", [])
+
+    def to_json(self):
+        """
+        Return the metadata serialised the way save() writes it.
+        """
+        return json.dumps(self.data, indent=4)
+
+    def save(self, json_file_path, io_stats=None, stage="yaml"):
+        with open(json_file_path, "w") as json_file:
+            json.dump(self.data, json_file, indent=4)
+        if io_stats is not None:
+            io_stats.add(stage, "writes")
+
+    def temp_json(self):
+        """
+        Return the JSON text of temp_copy(). If the table has been written and the temp copy has
+        the same columns, the text is derived from the written text by rewriting only its
+        schemaName line instead of serialising again.
+        """
+        if self.json_text is None or self.temp_columns is not None:
+            return self.temp_copy().to_json()
+        if self.data.get("schemaName") != "srcl":
+            return self.json_text
+        return self.json_text.replace(SRCL_SCHEMA_LINE, TEMP_SCHEMA_LINE, 1)
+
+    def temp_copy(self):
+        """
+        Return a copy of the metadata with schemaName changed from "srcl" to "temp", and with
+        temp_columns as its columns if they are set.
+        """
+        data = self.data
+        if self.temp_columns is not None:
+            data = dict(data, columns=self.temp_columns)
+        if data.get("schemaName") != "srcl":
+            return TableMetadata(self.file_name, data)
+        return TableMetadata(self.file_name, dict(data, schemaName="temp"))
+
+class MetadataCache:
+    """
+    The text of the JSON metadata files, shared by several generate_yaml runs (e.g. the
+    workbooks of a batch) so that each file is read from disk only once. Files rewritten
+    during the runs are updated in the cache, so every run sees the same content as it
+    would on disk. The least recently used files are dropped beyond max_bytes of text.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.texts = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def load(self, json_file_path, io_stats=None, stage="yaml"):
+        """
+        Return the TableMetadata of a file like TableMetadata.load, reading the file only on a cache miss.
+        """
+        return TableMetadata(os.path.basename(json_file_path), json.loads(self.read_text(json_file_path, io_stats, stage)))
+
+    def read_text(self, json_file_path, io_stats=None, stage="yaml"):
+        """
+        Return the text of a file, reading it only on a cache miss.
+        """
+        key = os.path.abspath(json_file_path)
+        with self.lock:
+            text = self.texts.get(key)
+            if text is not None:
+                self.texts.move_to_end(key)
+                self.hits += 1
+        if text is None:
+            with open(json_file_path, "r") as json_file:
+                text = json_file.read()
+            if io_stats is not None:
+                io_stats.add(stage, "reads")
+            with self.lock:
+                self.misses += 1
+                self._put(key, text)
+        return text
+
+    def update(self, json_file_path, json_text):
+        """
+        Record the new text of a file that was rewritten, if the file is cached.
+        """
+        key = os.path.abspath(json_file_path)
+        with self.lock:
+            if key in self.texts:
+                self._put(key, json_text)
+
+    def _put(self, key, text):
+        # Called with self.lock held
+        old_text = self.texts.pop(key, None)
+        if old_text is not None:
+            self.size -= len(old_text)
+        self.texts[key] = text
+        self.size += len(text)
+        while self.size > self.max_bytes and len(self.texts) > 1:
+            _, evicted = self.texts.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self):
+        """
+        Return the hits, misses and size of the cache as a dict.
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "files": len(self.texts), "bytes": self.size}
@@ -0,0 +1,142 @@
+# task_diff.py
+
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+def index_tasks(entries, source="tasks"):
+    """
+    Index a list of {"DBtoRedshift"/"OGGToRedshift": task} entries by task_id.
+    Returns {task_id: (task type, task)}; of repeated task_ids the last one wins, as in a deployment.
+    """
+    tasks = {}
+    for entry in entries:
+        for task_type, task in entry.items():
+            task_id = task["task_id"]
+            if task_id in tasks:
+                logger.warning("Task '%s' is listed more than once in %s. Using the last one.", task_id, source)
+            tasks[task_id] = (task_type, task)
+    return tasks
+
+def load_yaml_tasks(yaml_path):
+    """
+    Load a generated YAML file, or a folder of YAML shards (see yaml_emitter.ShardedTaskWriter),
+    and index its tasks by task_id. A missing file has no tasks (OGGToRedshift.yml is not written
+    when there are no OGG tasks).
+    """
+    import yaml
+
+    if not os.path.exists(yaml_path):
+        logger.warning("YAML file '%s' not found. Treating it as empty.", yaml_path)
+        return {}
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    if os.path.isdir(yaml_path):
+        # The shards are read in the order of the index, which is the order they were first written in
+        with open(os.path.join(yaml_path, "index.yml"), "r") as index_file:
+            index = yaml.load(index_file, Loader=loader) or {}
+        yaml_paths = [os.path.join(yaml_path, shard["file"]) for shard in index.get("shards", [])]
+    else:
+        yaml_paths = [yaml_path]
+    entries = []
+    for shard_path in yaml_paths:
+        with open(shard_path, "r") as yaml_file:
+            entries.extend(yaml.load(yaml_file, Loader=loader) or [])
+    return index_tasks(entries, f"'{yaml_path}'")
+
+def normalize(value):
+    """
+    Return value with NaN (written by YAML as .nan) turned into None, so that a missing cell
+    compares equal whether it was read back from YAML or taken from the template.
+    """
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    return value
+
+def column_list_changes(old_columns, new_columns):
+    """
+    Describe how a column_list changed: the columns added and removed, in list order,
+    and whether the columns both lists share are in a different order.
+    """
+    old_columns = old_columns or []
+    new_columns = new_columns or []
+    old_set = set(old_columns)
+    new_set = set(new_columns)
+    shared_old = [column for column in old_columns if column in new_set]
+    shared_new = [column for column in new_columns if column in old_set]
+    return {
+        "added": [column for column in new_columns if column not in old_set],
+        "removed": [column for column in old_columns if column not in new_set],
+        "reordered": shared_old != shared_new,
+    }
+
+def task_changes(old_task, new_task):
+    """
+    Return {field: {"old": ..., "new": ...}} for the fields that differ between two versions of
+    a task; a changed column_list also lists its added and removed columns.
+    """
+    changes = {}
+    for field in list(old_task) + [field for field in new_task if field not in old_task]:
+        old_value = normalize(old_task.get(field))
+        new_value = normalize(new_task.get(field))
+        if old_value == new_value:
+            continue
+        if field == "column_list":
+            changes[field] = column_list_changes(old_value, new_value)
+        else:
+            changes[field] = {"old": old_value, "new": new_value}
+    return changes
+
+def diff_tasks(old_tasks, new_tasks):
+    """
+    Compare two task indexes (see index_tasks) and return the added, removed and changed tasks
+    as a JSON-serialisable dict. Each entry names the task_id and task type; changed tasks list
+    their changed fields.
+    """
+    added = [{"task_id": task_id, "type": task_type} for task_id, (task_type, _) in new_tasks.items() if task_id not in old_tasks]
+    removed = [{"task_id": task_id, "type": task_type} for task_id, (task_type, _) in old_tasks.items() if task_id not in new_tasks]
+    changed = []
+    unchanged = 0
+    for task_id, (task_type, new_task) in new_tasks.items():
+        if task_id not in old_tasks:
+            continue
+        old_type, old_task = old_tasks[task_id]
+        changes = task_changes(old_task, new_task)
+        if old_type != task_type:
+            changes["type"] = {"old": old_type, "new": task_type}
+        if changes:
+            changed.append({"task_id": task_id, "type": task_type, "changes": changes})
+        else:
+            unchanged += 1
+    return {
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "unchanged": unchanged,
+    }
+
+def log_diff(diff):
+    """
+    Log one line per added, removed or changed task and a summary line.
+    """
+    for task in diff["added"]:
+        logger.info("Added: %s (%s)", task["task_id"], task["type"])
+    for task in diff["removed"]:
+        logger.info("Removed: %s (%s)", task["task_id"], task["type"])
+    for task in diff["changed"]:
+        logger.info("Changed: %s (%s): %s", task["task_id"], task["type"], ", ".join(task["changes"]))
+    logger.info("%d added, %d removed, %d changed, %d unchanged tasks.", len(diff["added"]), len(diff["removed"]),
+                len(diff["changed"]), diff["unchanged"])
+
+def write_diff(diff, diff_path):
+    """
+    Write the diff as JSON to diff_path.
+    """
+    with open(diff_path, "w") as diff_file:
+        json.dump(diff, diff_file, indent=4, default=str)
@@ -0,0 +1,31 @@
+# tests/test_column_lists.py
+
+import unittest
+
+from dex_ingestion.column_lists import ColumnList
+
+AUDIT_COLUMN_NAMES = ("ETL_CREATED_BY", "ETL_CREATED_TIME", "ETL_LAST_UPDATED_BY", "ETL_LAST_UPDATED_TIME",
+                      "ETL_CHANGE_FLAG", "WF_AUDIT_ID")
+
+class ColumnListIndexTest(unittest.TestCase):
+    """
+    ColumnList indexes like the list of its names.
+    """
+
+    def setUp(self):
+        # A suffix longer than the table's own columns, as for a one-column table
+        self.column_list = ColumnList(("ID",), AUDIT_COLUMN_NAMES)
+        self.names = ["ID"] + list(AUDIT_COLUMN_NAMES)
+
+    def test_indexes_like_a_list(self):
+        for position in range(-len(self.names), len(self.names)):
+            self.assertEqual(self.column_list[position], self.names[position])
+        self.assertEqual(self.column_list[1:3], self.names[1:3])
+
+    def test_out_of_range_indexes_raise(self):
+        for position in (len(self.names), -len(self.names) - 1, -len(self.names) - 3, -2 * len(self.names)):
+            with self.assertRaises(IndexError):
+                self.column_list[position]
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,137 @@
 # utils.py
 
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
 from .constants import KEYWORDS_TO_RENAME
 
 def rename_column_if_keyword(column_name):
     """Rename the column if it matches any keyword in the list."""
     if column_name.upper() in KEYWORDS_TO_RENAME:
         return f"{column_name}_1"
-    return column_name
\ No newline at end of file
+    return column_name
+
+# Reserved keywords of each target warehouse; more can be added with load_keyword_set
+KEYWORD_SETS = {
+    "redshift": frozenset(KEYWORDS_TO_RENAME),
+}
+
+def load_keyword_set(file_path, target=None):
+    """
+    Load a keyword set from a file and register it under target (default: the file name
+    without extension). The file is either a JSON list or one keyword per line; blank
+    lines and lines starting with '#' are ignored. Returns the keyword set.
+    """
+    with open(file_path, "r") as keyword_file:
+        content = keyword_file.read()
+
+    if content.lstrip().startswith("["):
+        keywords = json.loads(content)
+    else:
+        keywords = [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith("#")]
+
+    keyword_set = frozenset(keyword.upper() for keyword in keywords)
+    KEYWORD_SETS[target or os.path.splitext(os.path.basename(file_path))[0]] = keyword_set
+    return keyword_set
+
+# Result of renaming the columns of one table: the new names in order, the
+# {old: new} renames, the (column, clashing name, final name) collisions and
+# the number of memoisation cache hits and misses
+RenameResult = namedtuple("RenameResult", ["columns", "renames", "collisions", "hits", "misses"])
+
+class KeywordRenamer:
+    """
+    Rename columns that match a keyword set, memoising the result per column name
+    in a bounded LRU cache shared by all tables (and threads) of a run.
+    """
+
+    def __init__(self, keywords=KEYWORDS_TO_RENAME, cache_size=65536):
+        self.keywords = frozenset(keyword.upper() for keyword in keywords)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def rename_columns(self, column_names):
+        """
+        Rename every column of a table that matches a keyword by appending "_1".
+        If the renamed name already exists in the table, the suffix is increased
+        until the name is unique and the collision is reported in the result.
+        """
+        new_names = []
+        hits = 0
+        misses = 0
+        cache = self.cache
+        with self.lock:
+            for column_name in column_names:
+                new_name = cache.get(column_name)
+                if new_name is None:
+                    misses += 1
+                    new_name = f"{column_name}_1" if column_name.upper() in self.keywords else column_name
+                    cache[column_name] = new_name
+                    if len(cache) > self.cache_size:
+                        cache.popitem(last=False)
+                else:
+                    hits += 1
+                    cache.move_to_end(column_name)
+                new_names.append(new_name)
+            self.hits += hits
+            self.misses += misses
+
+        renames = {}
+        collisions = []
+        taken = None
+        for position, (column_name, new_name) in enumerate(zip(column_names, new_names)):
+            if new_name == column_name:
+                continue
+            if taken is None:
+                taken = set(column_names)
+            if new_name in taken:
+                # e.g. ORDER -> ORDER_1 while the table already has an ORDER_1 column
+                suffix = 2
+                while f"{column_name}_{suffix}" in taken:
+                    suffix += 1
+                collisions.append((column_name, new_name, f"{column_name}_{suffix}"))
+                new_name = f"{column_name}_{suffix}"
+                new_names[position] = new_name
+            taken.add(new_name)
+            renames[column_name] = new_name
+
+        return RenameResult(new_names, renames, collisions, hits, misses)
+
+    def cache_info(self):
+        """
+        Return the cache statistics of this renamer as a dict.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self.cache),
+                "max_size": self.cache_size,
+            }
+
+# One shared renamer per keyword set, so the cache is reused across tables
+_RENAMERS = {}
+_RENAMERS_LOCK = threading.Lock()
+
+def get_renamer(keywords=None):
+    """
+    Return the shared KeywordRenamer for a keyword set (a target name from KEYWORD_SETS
+    or a set of keywords; default: Redshift).
+    """
+    if keywords is None:
+        keywords = KEYWORD_SETS["redshift"]
+    elif isinstance(keywords, str):
+        keywords = KEYWORD_SETS[keywords]
+    keywords = frozenset(keywords)
+
+    with _RENAMERS_LOCK:
+        renamer = _RENAMERS.get(keywords)
+        if renamer is None:
+            renamer = _RENAMERS[keywords] = KeywordRenamer(keywords)
+        return renamer
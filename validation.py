@@ -0,0 +1,349 @@
+# validation.py
+
+import json
+import logging
+import os
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .excel_processor import USED_COLUMNS, normalize_header
+from .table_metadata import IOStats
+
+logger = logging.getLogger(__name__)
+
+# One problem found in the template or its JSON files. Errors stop generate_yaml before
+# anything is written; warnings are rows the generator skips or fills in with defaults.
+# row is the 1-based data row number used in the generator's messages (None for the whole sheet).
+Problem = namedtuple("Problem", ["severity", "row", "column", "message"])
+
+class ValidationError(Exception):
+    """
+    Raised by generate_yaml when the pre-flight validation finds errors; holds every problem found.
+    """
+
+    def __init__(self, problems):
+        self.problems = problems
+        errors = sum(1 for problem in problems if problem.severity == "error")
+        super().__init__(f"{errors} validation errors")
+
+def is_missing(value):
+    """
+    Return True for an empty cell: None (openpyxl) or NaN (pandas).
+    """
+    return value is None or (isinstance(value, float) and value != value)
+
+def frame_columns(df, columns=USED_COLUMNS):
+    """
+    Return the row numbers and the {column: list of values} of the used columns of the
+    process_excel DataFrame. Missing columns are left out.
+    """
+    row_numbers = [index + 1 for index in df.index.tolist()]
+    return row_numbers, {column: df[column].tolist() for column in columns if column in df.columns}
+
+def record_columns(pairs, columns=USED_COLUMNS):
+    """
+    Return the row numbers and the {column: list of values} of (index, record) pairs,
+    e.g. from excel_processor.iter_excel_rows. Columns missing from the sheet hold None.
+    """
+    row_numbers = [index + 1 for index, _ in pairs]
+    return row_numbers, {column: [record.get(column) for _, record in pairs] for column in columns}
+
+def sheet_columns(input_excel, sheet_name, columns=USED_COLUMNS):
+    """
+    Read the used columns of a sheet with xlsx_reader, without importing openpyxl or pandas.
+    Returns the row numbers, the {column: list of values} of the columns found and whether
+    the sheet has a header row. Blank rows are skipped, as iter_excel_rows does.
+    """
+    from .xlsx_reader import iter_sheet_values
+
+    rows = iter_sheet_values(input_excel, sheet_name)
+    header = next(rows, None)
+    if header is None:
+        return [], {}, False
+
+    positions = {}
+    for position, column in enumerate(header):
+        if column is not None:
+            positions.setdefault(normalize_header(column), position)
+    found = [column for column in columns if column in positions]
+
+    row_numbers = []
+    values = {column: [] for column in found}
+    for index, row in enumerate(rows):
+        if all(value is None for value in row):
+            continue
+        row_numbers.append(index + 1)
+        for column in found:
+            position = positions[column]
+            values[column].append(row[position] if position < len(row) else None)
+    return row_numbers, values, True
+
+def check_columns(values):
+    """
+    Report the used columns missing from the sheet. Rows cannot be checked without them.
+    """
+    missing = [column for column in USED_COLUMNS if column not in values]
+    if missing:
+        return [Problem("error", None, None, f"Columns not found in the sheet: {missing}")]
+    return []
+
+def check_rows(row_numbers, values):
+    """
+    Check every row of the sheet, one column at a time, and return the problems found.
+    Rows without a valid "schema.table" source table name are skipped by the generator,
+    so only the table name of those rows is checked.
+    """
+    return check_row_values(row_numbers, values) + check_task_keys(task_keys(row_numbers, values))
+
+def check_row_values(row_numbers, values):
+    """
+    Run the checks of check_rows that look at one row at a time.
+    """
+    problems = []
+
+    # Source table name: missing rows are skipped, anything else must be "schema.table"
+    table_names = values["source table name"]
+    valid = [isinstance(name, str) and "." in name for name in table_names]
+    for row_number, name in zip(row_numbers, table_names):
+        if is_missing(name):
+            problems.append(Problem("warning", row_number, "source table name", "'source table name' is missing; the row is skipped."))
+        elif not isinstance(name, str):
+            problems.append(Problem("error", row_number, "source table name", f"'source table name' is not a string. Value: {name}"))
+        elif "." not in name:
+            problems.append(Problem("error", row_number, "source table name", f"'source table name' has no schema. Value: {name}"))
+
+    def rows_where(column, condition):
+        # Row numbers of the valid rows whose value in column meets condition
+        return [(row_number, value) for row_number, is_valid, value in zip(row_numbers, valid, values[column])
+                if is_valid and condition(value)]
+
+    # Values the task ids, target tables and tasks are built from
+    for row_number, _ in rows_where("source system name", is_missing):
+        problems.append(Problem("error", row_number, "source system name", "'source system name' is missing; the target table would be 'nan_<table>'."))
+    for row_number, _ in rows_where("source system database name", is_missing):
+        problems.append(Problem("warning", row_number, "source system database name", "'source system database name' is missing; source_db and source_secret_name will be null."))
+    for row_number, _ in rows_where("source system db type", is_missing):
+        problems.append(Problem("warning", row_number, "source system db type", "'source system db type' is missing; source_type will be null and the audit columns are added."))
+    for row_number, _ in rows_where("json file", is_missing):
+        problems.append(Problem("warning", row_number, "json file", "'json file' is missing; the tasks will have an empty column_list."))
+    for row_number, value in rows_where("json file", lambda value: not is_missing(value) and not isinstance(value, str)):
+        problems.append(Problem("error", row_number, "json file", f"'json file' is not a file name. Value: {value}"))
+    for row_number, value in rows_where("task2", lambda value: not is_missing(value) and value != "OGGToRedshift"):
+        problems.append(Problem("warning", row_number, "task2", f"'task2' is not 'OGGToRedshift'; no OGGToRedshift task is created. Value: {value}"))
+
+    # Table size: non-numeric sizes are treated as small tables
+    def not_a_size(value):
+        if is_missing(value) or isinstance(value, (int, float)):
+            return False
+        try:
+            float(value)
+        except (TypeError, ValueError):
+            return True
+        return False
+    for row_number, value in rows_where("source table size (gb)", not_a_size):
+        problems.append(Problem("warning", row_number, "source table size (gb)", f"'source table size (gb)' is not a number; the table is not partitioned. Value: {value}"))
+
+    # Archived tables need the history table for their _hist task
+    archived = values["table archived (y/n)"]
+    for row_number, value in rows_where("table archived (y/n)", lambda value: not is_missing(value) and value not in ("Y", "N")):
+        problems.append(Problem("warning", row_number, "table archived (y/n)", f"'table archived (y/n)' is not 'Y' or 'N'; the table is treated as not archived. Value: {value}"))
+    hist_tables = values["source archival/history table name"]
+    hist_schemas = values["source archival/history schema name"]
+    for row_number, is_valid, is_archived, hist_table, hist_schema in zip(row_numbers, valid, archived, hist_tables, hist_schemas):
+        if not is_valid or is_archived != "Y":
+            continue
+        if not isinstance(hist_table, str):
+            problems.append(Problem("error", row_number, "source archival/history table name", "'source archival/history table name' is missing for an archived table."))
+        if is_missing(hist_schema):
+            problems.append(Problem("warning", row_number, "source archival/history schema name", "'source archival/history schema name' is missing; the _hist task's source_schema will be null."))
+
+    return problems
+
+def task_keys(row_numbers, values):
+    """
+    Return the (row number, (system, table, frequency)) of the rows with a valid source table name;
+    two rows with the same key produce the same task_id.
+    """
+    return [
+        (row_number, (str(system), name.split(".", 1)[1], frequency.lower() if isinstance(frequency, str) else "unknown"))
+        for row_number, system, name, frequency in zip(row_numbers, values["source system name"], values["source table name"],
+                                                       values["data refresh frequency"])
+        if isinstance(name, str) and "." in name
+    ]
+
+def check_task_keys(keyed_rows):
+    """
+    Report the rows of task_keys whose key is shared with another row.
+    """
+    problems = []
+    duplicates = {key for key, count in Counter(key for _, key in keyed_rows).items() if count > 1}
+    for row_number, key in keyed_rows:
+        if key in duplicates:
+            problems.append(Problem("warning", row_number, "source table name", f"task_id 'de_etl_{key[0]}_{key[1]}_{key[2]}' is generated by more than one row."))
+    return problems
+
+def check_json_file(json_file_path, metadata_cache=None, io_stats=None):
+    """
+    Check that a JSON file exists and holds table metadata the generator can enrich.
+    Returns (severity, message), or None if the file is fine. The file is read through
+    metadata_cache if one is given, so the generator does not read it again, and the read
+    is counted in io_stats under the "validate" stage.
+    """
+    try:
+        if metadata_cache is not None:
+            text = metadata_cache.read_text(json_file_path, io_stats, stage="validate")
+        else:
+            with open(json_file_path, "r") as json_file:
+                text = json_file.read()
+            if io_stats is not None:
+                io_stats.add("validate", "reads")
+        data = json.loads(text)
+    except FileNotFoundError:
+        return "warning", "not found; the tasks will have an empty column_list"
+    except (OSError, UnicodeDecodeError) as error:
+        return "error", f"cannot be read ({error})"
+    except ValueError as error:
+        return "error", f"is not valid JSON ({error})"
+
+    if not isinstance(data, dict):
+        return "error", "does not hold a JSON object"
+    columns = data.get("columns")
+    if not isinstance(columns, list):
+        return "error", "has no 'columns' list"
+    for position, column in enumerate(columns):
+        if not isinstance(column, dict):
+            return "error", f"column {position + 1} is not a JSON object"
+        if column.get("name") and not isinstance(column["name"], str):
+            return "error", f"column {position + 1} has a name that is not a string ({column['name']!r})"
+    return None
+
+def check_json_files(row_numbers, values, json_folder, workers=8, metadata_cache=None, io_stats=None):
+    """
+    Check every JSON file referenced by a valid row once, reading and parsing the files
+    on a thread pool. Returns the problems found, one per referencing row.
+    """
+    references = {}
+    for row_number, name, json_file_name in zip(row_numbers, values["source table name"], values["json file"]):
+        if isinstance(name, str) and "." in name and isinstance(json_file_name, str):
+            references.setdefault(json_file_name, []).append(row_number)
+
+    def check(json_file_name):
+        # Each file counts its reads on its own; they are merged on this thread
+        file_io_stats = IOStats() if io_stats is not None else None
+        return check_json_file(os.path.join(json_folder, json_file_name), metadata_cache, file_io_stats), file_io_stats
+
+    json_file_names = list(references)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        results = executor.map(check, json_file_names)
+        problems = []
+        for json_file_name, (result, file_io_stats) in zip(json_file_names, results):
+            if file_io_stats is not None:
+                io_stats.merge(file_io_stats)
+            if result is not None:
+                severity, message = result
+                for row_number in references[json_file_name]:
+                    problems.append(Problem(severity, row_number, "json file", f"JSON file '{json_file_name}' {message}."))
+    return problems
+
+def check_row_json_files(rows, json_folder, workers=8, metadata_cache=None, io_stats=None):
+    """
+    Check the JSON files of a list of row_records.TableRow records as check_json_files does.
+    """
+    row_numbers = [row.index + 1 for row in rows]
+    values = {"source table name": [row.table_name for row in rows], "json file": [row.json_file for row in rows]}
+    return check_json_files(row_numbers, values, json_folder, workers, metadata_cache, io_stats)
+
+def sort_problems(problems):
+    """
+    Order problems by row, errors first.
+    """
+    problems.sort(key=lambda problem: (problem.row or 0, problem.severity != "error"))
+    return problems
+
+def validate_columns(row_numbers, values, json_folder, workers=8, check_json=True, metadata_cache=None, io_stats=None):
+    """
+    Run every check over the sheet columns and (if check_json is set) the referenced JSON files
+    and return all the problems found, ordered by row.
+    """
+    problems = check_columns(values)
+    if problems:
+        return problems
+    problems = check_rows(row_numbers, values)
+    if check_json:
+        problems += check_json_files(row_numbers, values, json_folder, workers, metadata_cache, io_stats)
+    return sort_problems(problems)
+
+class ChunkValidator:
+    """
+    Validate a sheet given one chunk of rows at a time, as validate_columns does for the whole
+    sheet. Only the task keys of the rows seen so far are kept, to find the rows producing the
+    same task_id; the problems of every chunk are returned by finish().
+    """
+
+    def __init__(self, json_folder, workers=8, metadata_cache=None, io_stats=None):
+        self.json_folder = json_folder
+        self.workers = workers
+        self.metadata_cache = metadata_cache
+        self.io_stats = io_stats
+        self.problems = []
+        self.keyed_rows = []
+
+    @property
+    def has_errors(self):
+        return any(problem.severity == "error" for problem in self.problems)
+
+    def check_rows(self, row_numbers, values):
+        """
+        Check the rows of a chunk (its columns as from frame_columns or record_columns), but not their JSON files.
+        """
+        problems = check_columns(values)
+        if not problems:
+            problems = check_row_values(row_numbers, values)
+            self.keyed_rows.extend(task_keys(row_numbers, values))
+        self.problems.extend(problems)
+
+    def check_json_files(self, row_numbers, values):
+        """
+        Check the JSON files referenced by the rows of a chunk.
+        """
+        if "json file" in values:
+            self.problems.extend(check_json_files(row_numbers, values, self.json_folder, self.workers, self.metadata_cache,
+                                                  self.io_stats))
+
+    def check_row_json_files(self, rows):
+        """
+        Check the JSON files of some row_records.TableRow records.
+        """
+        self.problems.extend(check_row_json_files(rows, self.json_folder, self.workers, self.metadata_cache, self.io_stats))
+
+    def finish(self):
+        """
+        Return every problem found, ordered by row.
+        """
+        return sort_problems(self.problems + check_task_keys(self.keyed_rows))
+
+def validate(df, json_folder, workers=8, check_json=True, metadata_cache=None, io_stats=None):
+    """
+    Validate the process_excel DataFrame, or a list of (index, record) pairs from
+    iter_excel_rows, and the JSON files it references. Returns the list of Problems.
+    """
+    if hasattr(df, "columns"):
+        row_numbers, values = frame_columns(df)
+    else:
+        row_numbers, values = record_columns(df)
+    return validate_columns(row_numbers, values, json_folder, workers, check_json, metadata_cache, io_stats)
+
+def log_problems(problems):
+    """
+    Log each problem and return the number of (errors, warnings).
+    """
+    errors = warnings = 0
+    for problem in problems:
+        where = f"Row {problem.row}: " if problem.row is not None else ""
+        if problem.severity == "error":
+            errors += 1
+            logger.error("%s%s", where, problem.message)
+        else:
+            warnings += 1
+            logger.warning("%s%s", where, problem.message)
+    return errors, warnings
@@ -0,0 +1,120 @@
+# xlsx_reader.py
+
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
+
+# Namespaces of the spreadsheet parts
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+CELL_REFERENCE = re.compile(r"([A-Z]+)")
+
+def column_position(cell_reference):
+    """
+    Return the zero-based column position of a cell reference such as "C12".
+    """
+    letters = CELL_REFERENCE.match(cell_reference).group(1)
+    position = 0
+    for letter in letters:
+        position = position * 26 + ord(letter) - 64
+    return position - 1
+
+def sheet_part(archive, sheet_name):
+    """
+    Return the path of a sheet's XML part inside the workbook archive.
+    """
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    relationship_id = None
+    for sheet in workbook.iter(f"{MAIN_NS}sheet"):
+        if sheet.get("name") == sheet_name:
+            relationship_id = sheet.get(f"{REL_NS}id")
+            break
+    if relationship_id is None:
+        raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+    relationships = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for relationship in relationships.iter(f"{PACKAGE_REL_NS}Relationship"):
+        if relationship.get("Id") == relationship_id:
+            target = relationship.get("Target")
+            # Targets are either absolute in the archive or relative to xl/
+            return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    raise KeyError(f"Worksheet {sheet_name} has no part in the workbook.")
+
+def shared_strings(archive):
+    """
+    Return the shared string table of the workbook as a list.
+    """
+    try:
+        data = archive.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    for item in ElementTree.fromstring(data).iter(f"{MAIN_NS}si"):
+        # Rich text strings are split into several runs
+        strings.append("".join(text.text or "" for text in item.iter(f"{MAIN_NS}t")))
+    return strings
+
+def cell_value(cell, strings):
+    """
+    Return the value of a <c> element: a str, int, float or bool, or None for an empty cell.
+    Dates are returned as their serial number, since the number formats are not read.
+    """
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        # Empty inline strings are empty cells, as openpyxl reads them
+        return "".join(text.text or "" for text in cell.iter(f"{MAIN_NS}t")) or None
+    value = cell.findtext(f"{MAIN_NS}v")
+    if value is None:
+        return None
+    if cell_type == "s":
+        return strings[int(value)]
+    if cell_type == "b":
+        return value == "1"
+    if cell_type in ("str", "e"):
+        return value
+    number = float(value)
+    return int(number) if number.is_integer() and "." not in value and "E" not in value.upper() else number
+
+def iter_sheet_values(input_excel, sheet_name):
+    """
+    Yield the rows of a sheet as tuples of cell values, like openpyxl's
+    iter_rows(values_only=True) in read-only mode, using only the standard library.
+    Missing rows are yielded as empty tuples so row positions match the sheet.
+    This keeps quick checks (see cli.py validate) free of the openpyxl and pandas imports.
+    """
+    with zipfile.ZipFile(input_excel) as archive:
+        strings = shared_strings(archive)
+        with archive.open(sheet_part(archive, sheet_name)) as sheet:
+            next_row = 1
+            for _, element in ElementTree.iterparse(sheet):
+                if element.tag != f"{MAIN_NS}row":
+                    continue
+                row_number = int(element.get("r", next_row))
+                while next_row < row_number:
+                    yield ()
+                    next_row += 1
+                values = []
+                for cell in element.iter(f"{MAIN_NS}c"):
+                    reference = cell.get("r")
+                    if reference is not None:
+                        position = column_position(reference)
+                        if position > len(values):
+                            values.extend([None] * (position - len(values)))
+                    values.append(cell_value(cell, strings))
+                # Trailing empty cells carry no value
+                while values and values[-1] is None:
+                    values.pop()
+                yield tuple(values)
+                next_row = row_number + 1
+                element.clear()
+
+def sheet_names(input_excel):
+    """
+    Return the names of the sheets of a workbook, in workbook order.
+    """
+    with zipfile.ZipFile(input_excel) as archive:
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        return [sheet.get("name") for sheet in workbook.iter(f"{MAIN_NS}sheet")]
@@ -0,0 +1,375 @@
+# yaml_emitter.py
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+from yaml.events import (
+    AliasEvent,
+    DocumentEndEvent,
+    DocumentStartEvent,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+    StreamStartEvent,
+)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+from .column_lists import ColumnList, json_default
+from .output_writer import replace_if_changed, temp_path_for, write_file
+
+logger = logging.getLogger(__name__)
+
+# Use the LibYAML emitter if PyYAML was built with it, otherwise the pure-Python one
+try:
+    from yaml import CSafeDumper as BaseDumper
+except ImportError:
+    from yaml import SafeDumper as BaseDumper
+
+class ColumnListDumperMixin:
+    """
+    Dumper mixin that never aliases a ColumnList, so tasks sharing one each write their
+    column_list in full.
+    """
+
+    def ignore_aliases(self, data):
+        return type(data) is ColumnList or super().ignore_aliases(data)
+
+class TaskDumper(ColumnListDumperMixin, BaseDumper):
+    """
+    Dumper for the DBtoRedshift/OGGToRedshift task files.
+    """
+
+def represent_column_list(dumper, data):
+    """
+    Represent a ColumnList as a plain sequence.
+    """
+    return dumper.represent_sequence("tag:yaml.org,2002:seq", data)
+
+TaskDumper.add_representer(ColumnList, represent_column_list)
+
+# Rendered YAML text of a group of tasks (see TaskStreamWriter.render): its anchors are numbered
+# from first_anchor + 1 to first_anchor + anchors, and markers is the number of &idNNN/*idNNN it holds
+YamlFragment = namedtuple("YamlFragment", ["text", "first_anchor", "anchors", "markers"])
+
+ANCHOR_MARKER = re.compile(r"([&*])id(\d+)")
+
+class TaskStreamWriter:
+    """
+    Write task dicts to a YAML file as they are produced.
+
+    The file holds a single top-level sequence and is byte-identical to
+    yaml.dump(tasks, default_flow_style=False, sort_keys=False) over the full list:
+    objects shared by the tasks passed to one write() call (e.g. the column_rename
+    dict of a table's main and _hist tasks) get the same &idNNN anchors and aliases.
+    Each group of tasks is rendered to text on its own; write() returns that text as a
+    YamlFragment, which can be passed back to a later write() (e.g. from the build manifest)
+    to skip rendering unchanged tasks again.
+    The file is only created on the first write(), or by close() if write_empty is set,
+    in which case an empty list is written as "[]".
+    The tasks are streamed to a temp file that replaces yaml_path on close(), so readers never
+    see a partial file; yaml_path is left untouched if its content did not change.
+    """
+
+    ANCHOR_TEMPLATE = "id%03d"
+
+    def __init__(self, yaml_path, write_empty=True, fsync=True):
+        self.yaml_path = yaml_path
+        self.temp_path = temp_path_for(yaml_path)
+        self.write_empty = write_empty
+        self.fsync = fsync
+        self.yaml_file = None
+        self.last_anchor_id = 0
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self.yaml_file is not None:
+            self.yaml_file.close()
+            os.remove(self.temp_path)
+
+    def write(self, tasks, fragment=None):
+        """
+        Append a group of tasks (typically all the tasks of one Excel row) to the file and return
+        their YamlFragment. A fragment rendered from the same tasks is written instead of rendering them.
+        """
+        if not tasks:
+            return None
+        if self.yaml_file is None:
+            self.yaml_file = open(self.temp_path, "w")
+
+        text = self.place(fragment, self.last_anchor_id) if fragment is not None else None
+        if text is None:
+            fragment = self.render(tasks, self.last_anchor_id)
+            text = fragment.text
+        self.yaml_file.write(text)
+        self.last_anchor_id += fragment.anchors
+        self.count += len(tasks)
+        return fragment
+
+    def close(self):
+        """
+        Finish the file and return the number of tasks written.
+        """
+        if self.yaml_file is None:
+            if not self.write_empty:
+                return 0
+            self.yaml_file = open(self.temp_path, "w")
+            self.yaml_file.write("[]\n")
+        self.yaml_file.close()
+        replace_if_changed(self.temp_path, self.yaml_path, self.fsync)
+        return self.count
+
+    @classmethod
+    def place(cls, fragment, first_anchor):
+        """
+        Return the text of a fragment with its anchors renumbered to follow first_anchor, or None
+        if that cannot be done safely (a scalar looks like an anchor), in which case it is rendered again.
+        """
+        if fragment.first_anchor == first_anchor or not fragment.anchors:
+            return fragment.text
+        shift = first_anchor - fragment.first_anchor
+        text, markers = ANCHOR_MARKER.subn(lambda match: match.group(1) + cls.ANCHOR_TEMPLATE % (int(match.group(2)) + shift),
+                                           fragment.text)
+        return text if markers == fragment.markers else None
+
+    def render(self, tasks, first_anchor=0):
+        """
+        Render a group of tasks as the YAML text of their items in the top-level sequence,
+        numbering the anchors of the objects they share from first_anchor + 1.
+        """
+        stream = io.StringIO()
+        dumper = TaskDumper(stream, default_flow_style=False, sort_keys=False, default_style=None)
+        serializer = _GroupSerializer(dumper, self.ANCHOR_TEMPLATE, first_anchor)
+        try:
+            dumper.emit(StreamStartEvent())
+            dumper.emit(DocumentStartEvent(explicit=False))
+            dumper.emit(SequenceStartEvent(None, "tag:yaml.org,2002:seq", True, flow_style=False))
+            nodes = [dumper.represent_data(task) for task in tasks]
+            for node in nodes:
+                serializer.anchor_node(node)
+            for node in nodes:
+                serializer.serialize_node(node)
+            dumper.emit(SequenceEndEvent())
+            dumper.emit(DocumentEndEvent(explicit=False))
+            dumper.emit(StreamEndEvent())
+        finally:
+            dumper.dispose()
+        return YamlFragment(stream.getvalue(), first_anchor, serializer.last_anchor_id - first_anchor, serializer.markers)
+
+class _GroupSerializer:
+    """
+    Emit the nodes of one group of tasks, anchoring the nodes they share (as yaml.serializer.Serializer does).
+    """
+
+    def __init__(self, dumper, anchor_template, first_anchor):
+        self.dumper = dumper
+        self.anchor_template = anchor_template
+        self.last_anchor_id = first_anchor
+        self.anchors = {}
+        self.serialized_nodes = set()
+        self.markers = 0
+
+    def anchor_node(self, node):
+        if node in self.anchors:
+            if self.anchors[node] is None:
+                self.last_anchor_id += 1
+                self.anchors[node] = self.anchor_template % self.last_anchor_id
+        else:
+            self.anchors[node] = None
+            if isinstance(node, SequenceNode):
+                for item in node.value:
+                    self.anchor_node(item)
+            elif isinstance(node, MappingNode):
+                for key, value in node.value:
+                    self.anchor_node(key)
+                    self.anchor_node(value)
+
+    def serialize_node(self, node):
+        # Same events as yaml.serializer.Serializer.serialize_node
+        dumper = self.dumper
+        alias = self.anchors[node]
+        if alias is not None:
+            self.markers += 1
+        if node in self.serialized_nodes:
+            dumper.emit(AliasEvent(alias))
+            return
+        self.serialized_nodes.add(node)
+
+        if isinstance(node, ScalarNode):
+            detected_tag = dumper.resolve(ScalarNode, node.value, (True, False))
+            default_tag = dumper.resolve(ScalarNode, node.value, (False, True))
+            implicit = (node.tag == detected_tag), (node.tag == default_tag)
+            dumper.emit(ScalarEvent(alias, node.tag, implicit, node.value, style=node.style))
+        elif isinstance(node, SequenceNode):
+            implicit = node.tag == dumper.resolve(SequenceNode, node.value, True)
+            dumper.emit(SequenceStartEvent(alias, node.tag, implicit, flow_style=node.flow_style))
+            for item in node.value:
+                self.serialize_node(item)
+            dumper.emit(SequenceEndEvent())
+        elif isinstance(node, MappingNode):
+            implicit = node.tag == dumper.resolve(MappingNode, node.value, True)
+            dumper.emit(MappingStartEvent(alias, node.tag, implicit, flow_style=node.flow_style))
+            for key, value in node.value:
+                self.serialize_node(key)
+                self.serialize_node(value)
+            dumper.emit(MappingEndEvent())
+
+def is_missing_key(key):
+    """
+    Return True for a missing shard key: None, or NaN from an empty cell.
+    """
+    return key is None or (isinstance(key, float) and key != key)
+
+def key_digest(key):
+    """
+    Return a short hash of a shard key, to tell apart keys that would share a file name.
+    """
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:8]
+
+def shard_file_name(key):
+    """
+    Return the file name of a shard: its key with anything but letters, digits, "_", "-" and "."
+    replaced by "_", or "unknown" for a missing key. A key that had to be changed gets a short
+    hash of itself appended, so that e.g. "DB 1" and "DB_1" or ".." and "" get different files.
+    """
+    if is_missing_key(key):
+        return "unknown.yml"
+    name = re.sub(r"[^A-Za-z0-9_.-]+", "_", str(key)).strip(".")
+    if name != str(key) or not name:
+        name = f"{name or 'shard'}-{key_digest(key)}"
+    return name + ".yml"
+
+class ShardedTaskWriter:
+    """
+    Write task dicts to one YAML file per shard in shard_folder, plus a small index.yml listing
+    the shards with their task counts and content hashes.
+
+    Tasks are grouped by the key passed to write() (e.g. the source_db of the row), or, with a
+    shard_size, into consecutive shards of about shard_size tasks (a row's tasks are never split).
+    The shards are kept in memory and written by close() on a pool of workers threads, each
+    through a TaskStreamWriter, so every shard file has the same layout as the single-file output.
+    A shard whose tasks hash the same as in the previous index is not rendered or written again,
+    and shard files the previous index lists that no longer have tasks are removed.
+    """
+
+    INDEX_NAME = "index.yml"
+
+    def __init__(self, shard_folder, shard_by, shard_size=None, write_empty=True, fsync=True, workers=4):
+        self.shard_folder = shard_folder
+        self.yaml_path = shard_folder
+        self.shard_by = shard_by
+        self.shard_size = shard_size
+        self.write_empty = write_empty
+        self.fsync = fsync
+        self.workers = workers
+        self.shards = {}  # {file name: {"key": ..., "groups": [tasks of one write() call, ...], "count": ...}}
+        self.file_names = {}  # {key: file name}
+        self.taken_names = {self.INDEX_NAME}  # Lower-cased file names in use
+        self.count = 0
+        self.stats = {"shards": 0, "written": 0, "unchanged": 0, "removed": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def write(self, tasks, key=None):
+        """
+        Add a group of tasks (typically all the tasks of one Excel row) to the shard of key,
+        or to the current fixed-size shard.
+        """
+        if not tasks:
+            return
+        if self.shard_size:
+            number = len(self.shards) - 1
+            if number < 0 or self.shards[f"part-{number:05d}.yml"]["count"] >= self.shard_size:
+                number += 1
+            key = f"part-{number:05d}"
+        elif is_missing_key(key):
+            key = None
+        file_name = self.file_names.get(key) or self.shard_file_name(key)
+        shard = self.shards.setdefault(file_name, {"key": key, "groups": [], "count": 0})
+        shard["groups"].append(tasks)
+        shard["count"] += len(tasks)
+        self.count += len(tasks)
+
+    def shard_file_name(self, key):
+        """
+        Pick the file name of a new key. A key whose name is already taken by another key (e.g. a
+        missing key and "unknown", or names that only differ in case, which are the same file on
+        some file systems) or by the index gets its hash appended.
+        """
+        file_name = shard_file_name(key)
+        if file_name.lower() in self.taken_names:
+            file_name = f"{file_name[:-len('.yml')]}-{key_digest(key)}.yml"
+        self.file_names[key] = file_name
+        self.taken_names.add(file_name.lower())
+        return file_name
+
+    def _read_index(self):
+        index_path = os.path.join(self.shard_folder, self.INDEX_NAME)
+        if not os.path.exists(index_path):
+            return {}
+        with open(index_path, "r") as index_file:
+            index = yaml.safe_load(index_file) or {}
+        return {shard["file"]: shard.get("sha1") for shard in index.get("shards", [])}
+
+    def _write_shard(self, file_name):
+        with TaskStreamWriter(os.path.join(self.shard_folder, file_name), fsync=self.fsync) as writer:
+            for tasks in self.shards[file_name]["groups"]:
+                writer.write(tasks)
+
+    def close(self):
+        """
+        Write the changed shards and the index, remove the shards that are gone and
+        return the number of tasks written.
+        """
+        if not self.shards and not self.write_empty:
+            return 0
+        if not os.path.exists(self.shard_folder):
+            os.makedirs(self.shard_folder)
+
+        previous = self._read_index()
+        index = []
+        changed = []
+        for file_name, shard in self.shards.items():
+            # Hash the tasks rather than the rendered YAML, so unchanged shards are not even rendered
+            digest = hashlib.sha1(json.dumps(shard["groups"], default=json_default).encode("utf-8")).hexdigest()
+            if previous.get(file_name) != digest or not os.path.exists(os.path.join(self.shard_folder, file_name)):
+                changed.append(file_name)
+            index.append({"file": file_name, "key": shard["key"], "tasks": shard["count"], "sha1": digest})
+
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            # list() re-raises the first error of a shard
+            list(executor.map(self._write_shard, changed))
+
+        removed = 0
+        for file_name in previous:
+            file_path = os.path.join(self.shard_folder, file_name)
+            if file_name not in self.shards and os.path.exists(file_path):
+                os.remove(file_path)
+                removed += 1
+
+        index_text = yaml.safe_dump({"shard_by": self.shard_by, "tasks": self.count, "shards": index},
+                                    default_flow_style=False, sort_keys=False)
+        write_file(os.path.join(self.shard_folder, self.INDEX_NAME), index_text, fsync=self.fsync)
+
+        self.stats = {"shards": len(index), "written": len(changed), "unchanged": len(index) - len(changed), "removed": removed}
+        logger.info("%d shards in '%s': %d written, %d unchanged, %d removed.", len(index), self.shard_folder,
+                    len(changed), len(index) - len(changed), removed)
+        return self.count
@@ -1,12 +1,28 @@
 # yaml_generator.py
 
 import pandas as pd
-import yaml
+import contextlib
 import json
+import logging
 import os
 import shutil
-from .utils import rename_column_if_keyword
-from .sql_generator import generate_sql_file  # Import the SQL generator function
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from collections import Counter, namedtuple
+from .build_cache import BuildManifest, row_fingerprint
+from .column_lists import ColumnList
+from .instrumentation import RunReport
+from .output_writer import OutputWriter, link_file, write_file
+from .row_records import RowSpool, iter_pair_chunks, prepare_pair_chunk, prepare_row_pairs, prepare_rows
+from .table_metadata import IOStats, MetadataCache, TableMetadata
+from .utils import get_renamer
+from .validation import ChunkValidator, ValidationError, frame_columns, log_problems, record_columns
+from .sql_generator import SqlViewWriter, render_table_view
+from .yaml_emitter import ShardedTaskWriter, TaskStreamWriter
+
+logger = logging.getLogger(__name__)
 
 # Define the additional columns to add if the DB type is not 'sybase'
 ADDITIONAL_COLUMNS = [
@@ -104,6 +120,20 @@ OGG_COLUMNS_TO_EXCLUDE = {
     "OGG_COMMIT_TIMESTAMP"
 }
 
+# source_predicate_count of the tables partitioned for extraction, unless a sizing engine is used
+DEFAULT_PREDICATE_COUNT = 20
+
+# Names of the injected columns, as appended to a table's column_list by enrich_metadata.
+# Every table's ColumnLists reference these tuples instead of holding their own copies.
+AUDIT_COLUMN_NAMES = tuple(column["name"] for column in ADDITIONAL_COLUMNS)
+AUDIT_OGG_COLUMN_NAMES = AUDIT_COLUMN_NAMES + tuple(column["name"] for column in OGG_COLUMNS)
+
+# Result of processing one Excel row: its tasks, its loaded TableMetadata and its rendered
+# (sql_file_path, select_statement) view (both None if the row was skipped or its JSON file
+# is missing), the file I/O it did, its keyword renaming counts (cache hits, misses and collisions)
+# and the (wall_seconds, cpu_seconds) it took
+RowResult = namedtuple("RowResult", ["db_tasks", "ogg_tasks", "metadata", "view", "io_stats", "rename_stats", "timing"])
+
 def load_secret_names(secret_file_path):
     """
     Load the secret names from the secret_name.json file.
@@ -112,22 +142,140 @@ def load_secret_names(secret_file_path):
         with open(secret_file_path, "r") as secret_file:
             return json.load(secret_file)
     else:
-        print(f"Warning: Secret file '{secret_file_path}' not found.")
+        logger.warning("Secret file '%s' not found.", secret_file_path)
         return []
 
+class SecretIndex:
+    """
+    Index of the secret_name.json entries by source_db, built once per run.
+    The first entry of a source_db wins, as with the list scan; later entries for the same
+    source_db are recorded as duplicates (same secret) or conflicts (different secret).
+    """
+
+    def __init__(self, secret_names):
+        self.secrets = {}
+        self.duplicates = []
+        self.conflicts = {}
+        self.invalid = []
+
+        for position, secret in enumerate(secret_names):
+            if (not isinstance(secret, dict) or "source_db" not in secret or "secret_name" not in secret
+                    or isinstance(secret["source_db"], (list, dict))):
+                self.invalid.append(position)
+                continue
+            source_db = secret["source_db"]
+            secret_name = secret["secret_name"]
+            if source_db not in self.secrets:
+                self.secrets[source_db] = secret_name
+            elif self.secrets[source_db] == secret_name:
+                self.duplicates.append(source_db)
+            else:
+                self.conflicts.setdefault(source_db, [self.secrets[source_db]]).append(secret_name)
+
+    def __len__(self):
+        return len(self.secrets)
+
+    def get(self, source_db):
+        """
+        Return the secret name of source_db, or None if it has none.
+        """
+        try:
+            return self.secrets.get(source_db)
+        except TypeError:
+            # Unhashable cell values never match a secret
+            return None
+
+    def report_problems(self, secret_file_path):
+        """
+        Print the duplicate, conflicting and invalid entries found while building the index.
+        """
+        for position in self.invalid:
+            logger.warning("Entry %d of '%s' has no source_db or secret_name. Ignoring it.", position + 1, secret_file_path)
+        for source_db in sorted(set(self.duplicates), key=str):
+            logger.warning("source_db '%s' is listed more than once in '%s'.", source_db, secret_file_path)
+        for source_db, secret_names in self.conflicts.items():
+            logger.error("source_db '%s' has conflicting secrets in '%s': %s. Using '%s'.", source_db, secret_file_path, secret_names, secret_names[0])
+
+    def missing_rows(self, rows):
+        """
+        Return {source_db: [row numbers]} for the rows whose source_db has no secret,
+        ignoring the rows that are skipped for an invalid table name.
+        """
+        missing = {}
+        for row in rows:
+            if row.table_name_without_schema is not None and self.get(row.source_db) is None:
+                missing.setdefault(str(row.source_db), []).append(row.index + 1)
+        return missing
+
+def load_secret_index(secret_file_path):
+    """
+    Load secret_name.json into a SecretIndex and report its duplicate or conflicting entries.
+    """
+    secret_index = SecretIndex(load_secret_names(secret_file_path))
+    secret_index.report_problems(secret_file_path)
+    return secret_index
+
 def get_secret_name(source_db, secret_names):
     """
-    Get the secret name for the given source_db from the secret_names list.
+    Get the secret name for the given source_db from a SecretIndex, or by scanning a secret_names list.
     """
+    if isinstance(secret_names, SecretIndex):
+        return secret_names.get(source_db)
     for secret in secret_names:
         if secret["source_db"] == source_db:
             return secret["secret_name"]
     return None
 
-def create_temp_folder_and_update_schema(json_folder):
+def save_json(metadata, json_file_path, io_stats=None, stage="yaml", output=None, metadata_cache=None, fsync=False):
+    """
+    Write a table's JSON metadata through the output writer if one is given,
+    otherwise right away (flushed to disk with fsync); either way files with unchanged
+    content are not rewritten. A file held in metadata_cache is updated there too.
+    """
+    json_text = metadata.to_json()
+    if output is not None:
+        output.submit(json_file_path, json_text)
+    else:
+        write_file(json_file_path, json_text, fsync)
+    if metadata_cache is not None:
+        metadata_cache.update(json_file_path, json_text)
+    metadata.json_text = json_text
+    if io_stats is not None:
+        io_stats.add(stage, "writes")
+
+def save_temp_json(metadata, src_path, dest_path, io_stats=None, output=None, links="copy"):
+    """
+    Write the temp copy of a table. A table whose schemaName is not "srcl" (and whose temp copy
+    has the same columns) needs no change, so with links set to "symlink" or "hardlink" its temp
+    file is linked to src_path instead (src_path must already be written). Returns True if the
+    file was linked.
     """
-    Create a temp folder and copy all JSON files from the srcl folder to it.
+    if links != "copy" and metadata.data.get("schemaName") != "srcl" and metadata.temp_columns is None:
+        link_file(src_path, dest_path, links)
+        if io_stats is not None:
+            io_stats.add("temp", "writes")
+        return True
+
+    json_text = metadata.temp_json()
+    if output is not None:
+        output.submit(dest_path, json_text)
+    else:
+        write_file(dest_path, json_text)
+    if io_stats is not None:
+        io_stats.add("temp", "writes")
+    return False
+
+def create_temp_folder_and_update_schema(json_folder, only_stale=False, tables=None, io_stats=None, output=None, all_files=True,
+                                         links="copy", written_file_names=()):
+    """
+    Create a temp folder and copy the JSON files from the srcl folder to it.
     Update the schemaName from "srcl" to "temp" in each JSON file.
+    Tables already loaded as TableMetadata are written from memory, deriving the temp JSON from
+    the text written to the srcl folder. With all_files, the remaining files in the folder are
+    read from disk as well, except written_file_names (written from memory by earlier calls);
+    with only_stale, those whose temp copy is newer than the srcl file are left alone. The files
+    are written through output if given, and tables that need no change are linked instead of
+    copied if links is "symlink" or "hardlink".
     """
     # Define the path for the temp folder
     temp_folder = os.path.join(os.path.dirname(json_folder), "temp")
@@ -135,270 +283,740 @@ def create_temp_folder_and_update_schema(json_folder):
     # Create the temp folder if it doesn't exist
     if not os.path.exists(temp_folder):
         os.makedirs(temp_folder)
-        print(f"Created temp folder at: {temp_folder}")
+        logger.info("Created temp folder at: %s", temp_folder)
+
+    # Write the tables loaded during this run without reading them again
+    tables = tables or []
+    for metadata in tables:
+        src_path = os.path.join(json_folder, metadata.file_name)
+        dest_path = os.path.join(temp_folder, metadata.file_name)
+        if save_temp_json(metadata, src_path, dest_path, io_stats, output, links):
+            logger.debug("Linked '%s' into temp folder.", metadata.file_name)
+        else:
+            logger.debug("Updated schemaName in '%s' and copied to temp folder.", metadata.file_name)
 
-    # Iterate over all JSON files in the srcl folder
+    if not all_files:
+        return
+
+    # Iterate over all other JSON files in the srcl folder
+    loaded_file_names = {metadata.file_name for metadata in tables}.union(written_file_names)
     for json_file_name in os.listdir(json_folder):
-        if json_file_name.endswith(".json"):
+        if json_file_name.endswith(".json") and json_file_name not in loaded_file_names:
             # Define the source and destination paths
             src_path = os.path.join(json_folder, json_file_name)
             dest_path = os.path.join(temp_folder, json_file_name)
 
-            # Read the JSON file
-            with open(src_path, "r") as json_file:
-                json_data = json.load(json_file)
-
-            # Update the schemaName from "srcl" to "temp"
-            if "schemaName" in json_data and json_data["schemaName"] == "srcl":
-                json_data["schemaName"] = "temp"
+            # Skip files that have not changed since their temp copy was written
+            if only_stale and os.path.exists(dest_path) and os.path.getmtime(dest_path) >= os.path.getmtime(src_path):
+                continue
 
-            # Write the updated JSON data to the temp folder
-            with open(dest_path, "w") as json_file:
-                json.dump(json_data, json_file, indent=4)
+            # Read the JSON file, update the schemaName from "srcl" to "temp" and
+            # write the updated JSON data to the temp folder
+            metadata = TableMetadata.load(src_path, io_stats, stage="temp")
+            if save_temp_json(metadata, src_path, dest_path, io_stats, output, links):
+                logger.debug("Linked '%s' into temp folder.", json_file_name)
+            else:
+                logger.debug("Updated schemaName in '%s' and copied to temp folder.", json_file_name)
 
-            print(f"Updated schemaName in '{json_file_name}' and copied to temp folder.")
+def append_missing_columns(json_data, columns, column_list):
+    """
+    Append the injected audit/OGG columns that the JSON metadata does not already have,
+    so that running over already enriched metadata does not add them twice.
+    """
+    existing_names = {column.get("name") for column in json_data["columns"]}
+    for col in columns:
+        if col["name"] not in existing_names:
+            json_data["columns"].append(col)
+            # Add the column name to the column_list
+            column_list.append(col["name"])
+
+def enrich_metadata(metadata, row, renamer=None, rename_stats=None):
+    """
+    Rename keyword columns in the table's JSON metadata and add the audit/OGG columns.
+    Returns the column_list and the column_rename dict of the table.
+    Columns are renamed in one batch by renamer (default: the shared Redshift renamer);
+    its cache hits, misses and collisions are added to the rename_stats Counter if given.
+    """
+    if renamer is None:
+        renamer = get_renamer()
+    json_data = metadata.data
 
-def generate_yaml(df, output_yaml, output_yaml2, json_folder):
-    # Initialize empty lists to store the YAML data
-    yaml_data = []
-    yaml_data2 = []
+    # Extract column names from the "columns" array and rename the keyword columns
+    columns = [column for column in json_data.get("columns", []) if column.get("name")]
+    result = renamer.rename_columns([column["name"] for column in columns])
+    column_list = result.columns
+    column_rename = result.renames  # Dictionary to track renamed columns
 
-    # Load the secret names from the secret_name.json file (located outside the srcl folder)
-    secret_file_path = os.path.join(os.path.dirname(json_folder), "secret_name.json")
-    secret_names = load_secret_names(secret_file_path)
+    # Update the column names in the JSON data
+    for column, new_column_name in zip(columns, column_list):
+        column["name"] = new_column_name
 
-    # Create the srcl_vw folder if it doesn't exist
-    srcl_vw_folder = os.path.join(os.path.dirname(json_folder), "srcl_vw")
-    if not os.path.exists(srcl_vw_folder):
-        os.makedirs(srcl_vw_folder)
-        print(f"Created srcl_vw folder at: {srcl_vw_folder}")
+    for column_name, clashing_name, new_column_name in result.collisions:
+        logger.warning("Column '%s' in '%s' renamed to '%s' because '%s' already exists.", column_name, metadata.file_name, new_column_name, clashing_name)
 
-    # Process each row in the DataFrame
-    for index, row in df.iterrows():
-        # Extract the table name
-        table_name = row["source table name"]
+    if rename_stats is not None:
+        rename_stats["hits"] += result.hits
+        rename_stats["misses"] += result.misses
+        rename_stats["collisions"] += len(result.collisions)
 
-        # Debug: Print table_name and its type
-        print(f"Processing row {index + 1}: table_name = {table_name}, type = {type(table_name)}")
+    # Add additional columns if the DB type is not 'sybase'
+    if not row.is_sybase:
+        append_missing_columns(json_data, ADDITIONAL_COLUMNS, column_list)
 
-        # Skip rows with missing table_name
-        if pd.isna(table_name):
-            print(f"Skipping row {index + 1} because 'source table name' is missing.")
-            continue
+    # Add OGG-related columns if the DB type is not 'sybase' and task2 is 'OGGToRedshift'
+    if not row.is_sybase and row.is_ogg:
+        append_missing_columns(json_data, OGG_COLUMNS, column_list)
 
-        # Split the table name to get schema and table
-        try:
-            schema_name, table_name_without_schema = table_name.split(".", 1)
-        except AttributeError:
-            print(f"Error: 'source table name' is not a valid string in row {index + 1}. Value: {table_name}")
-            continue
+    return column_list, column_rename
 
-        # Create the target_table by prepending the system name and replacing '.' with '_'
-        target_table = f"{row['source system name']}_{table_name_without_schema}"
+def table_column_lists(column_list):
+    """
+    Return the DBtoRedshift (without the OGG columns) and the OGGToRedshift column lists of a
+    table as ColumnLists sharing one tuple of the table's own column names, interned so that
+    names repeated across tables are stored once. When the list ends with the audit (and OGG)
+    columns, they are represented by the shared AUDIT_COLUMN_NAMES/AUDIT_OGG_COLUMN_NAMES tuples.
+    """
+    for suffix in (AUDIT_OGG_COLUMN_NAMES, AUDIT_COLUMN_NAMES):
+        if len(column_list) >= len(suffix) and tuple(column_list[-len(suffix):]) == suffix:
+            break
+    else:
+        suffix = ()
+    columns = tuple(sys.intern(name) if type(name) is str else name for name in column_list[:len(column_list) - len(suffix)])
+    all_columns = ColumnList(columns, suffix)
+
+    db_suffix = AUDIT_COLUMN_NAMES if suffix else ()
+    if not OGG_COLUMNS_TO_EXCLUDE.isdisjoint(columns):
+        # OGG columns that are not in the trailing run (e.g. in an edited JSON file) are dropped one by one
+        db_columns = ColumnList(tuple(name for name in columns if name not in OGG_COLUMNS_TO_EXCLUDE), db_suffix)
+    elif db_suffix is suffix:
+        db_columns = all_columns
+    else:
+        db_columns = ColumnList(columns, db_suffix)
+    return db_columns, all_columns
 
-        # Get the Data Refresh Frequency value
-        refresh_frequency = row["data refresh frequency"]
-        if pd.isna(refresh_frequency):
-            refresh_frequency = "unknown"  # Default value if missing
+def build_tasks(row, column_list, column_rename, secret_name, predicate_count=DEFAULT_PREDICATE_COUNT):
+    """
+    Build the DBtoRedshift tasks (main and _hist) and the OGGToRedshift task of a row.
+    Large tables are extracted with predicate_count predicates (see sizing.SizingEngine).
+    Returns a (db_tasks, ogg_tasks) tuple of lists.
+    The tasks reference the column lists of table_column_lists rather than copies, so a
+    table's columns are held once however many tasks it has (also in the build manifest).
+    """
+    db_tasks = []
+    ogg_tasks = []
+    db_columns, all_columns = table_column_lists(column_list)
+
+    # Create the nested structure for DBtoRedshift
+    db_to_redshift = {
+        "DBtoRedshift": {
+            "task_id": row.task_id,
+            "source_db": row.source_db,
+            "source_schema": row.schema_name,
+            "source_table": row.table_name_without_schema,
+            "source_secret_name": secret_name,  # Use the secret name if available, otherwise null
+            "source_type": row.source_type,
+            "target_schema": "srcl",  # Fixed value for target_schema
+            "target_database": "kmbl_dex",
+            "target_table": row.target_table,
+            "db_user": "de_etl_role",
+            "transformation_function": "bods_truncate_and_load_transformation",
+            "column_list": db_columns  # Excludes the OGG columns
+        }
+    }
 
-        # Create the task_id by prepending 'de_etl_' to the target_table and appending refresh_frequency
-        task_id = f"de_etl_{target_table}_{refresh_frequency.lower()}"
+    # Add column_rename parameter if any columns were renamed
+    if column_rename:
+        db_to_redshift["DBtoRedshift"]["column_rename"] = column_rename
 
-        # Read the JSON file to get column names
-        json_file_name = row["json file"]
-        json_file_path = os.path.join(json_folder, json_file_name)
+    # Add source_partition_column and source_predicate_count after target_table if
+    # "Source Table Size (GB)" is greater than 10 and a reliable date column is given
+    if row.is_large:
+        db_to_redshift["DBtoRedshift"]["source_partition_column"] = row.reliable_date_column
+        db_to_redshift["DBtoRedshift"]["source_predicate_count"] = predicate_count
 
-        # Initialize an empty list for column names
-        column_list = []
-        column_rename = {}  # Dictionary to track renamed columns
-
-        # Extract the table classification, PII, and SPII information
-        table_classification = row["table classification"]
-        is_pii = row["is pii [y/n]"]
-        is_spii = row["is spii [y/n]"]
-        pii_column_name = row["pii column name"]
-        spii_column_name = row["spii column name"]
-
-        # Get the source_db name from the row
-        source_db = row["source system database name"]
-
-        # Get the secret name for the source_db
-        secret_name = get_secret_name(source_db, secret_names)
-
-        # Check if the JSON file exists
-        if os.path.exists(json_file_path):
-            with open(json_file_path, "r") as json_file:
-                json_data = json.load(json_file)
-                # Extract column names from the "columns" array
-                for column in json_data.get("columns", []):
-                    column_name = column.get("name")
-                    if column_name:
-                        # Rename the column if it matches any keyword
-                        new_column_name = rename_column_if_keyword(column_name)
-                        if new_column_name != column_name:
-                            column_rename[column_name] = new_column_name  # Track renamed columns
-                        column_list.append(new_column_name)
-                        # Update the column name in the JSON data
-                        column["name"] = new_column_name
-
-                # Add additional columns if the DB type is not 'sybase'
-                if row["source system db type"].lower() != "sybase":
-                    json_data["columns"].extend(ADDITIONAL_COLUMNS)
-                    # Add the additional column names to the column_list
-                    for col in ADDITIONAL_COLUMNS:
-                        column_list.append(col["name"])
-
-                # Add OGG-related columns if the DB type is not 'sybase' and task2 is 'OGGToRedshift'
-                if row["source system db type"].lower() != "sybase" and row["task2"] == "OGGToRedshift":
-                    json_data["columns"].extend(OGG_COLUMNS)
-                    # Add the OGG column names to the column_list
-                    for col in OGG_COLUMNS:
-                        column_list.append(col["name"])
-
-            # Write the updated JSON data back to the file
-            with open(json_file_path, "w") as json_file:
-                json.dump(json_data, json_file, indent=4)
-
-            # Generate the SQL file for this JSON file
-            generate_sql_file(
-                json_file_path,  # Pass the JSON file path
-                column_list,
-                table_classification,
-                is_pii,
-                is_spii,
-                pii_column_name,
-                spii_column_name,
-                srcl_vw_folder  # Pass the srcl_vw folder path
-            )
-        else:
-            print(f"Warning: JSON file '{json_file_name}' not found for table '{table_name}'.")
+    # Append this structure to the DBtoRedshift task list
+    db_tasks.append(db_to_redshift)
 
-        # Debug: Print column_rename dictionary
-        print(f"Column rename dictionary for row {index + 1}: {column_rename}")
+    # Check if the table is archived (Table Archived (Y/N) == 'Y')
+    if row.is_archived and row.hist_source_table is None:
+        logger.error("'source archival/history table name' is missing in row %d. Skipping the history task.", row.index + 1)
+    elif row.is_archived:
+        # Create a new task for the historical/archived table
+        hist_task_id = f"{row.task_id}_hist"  # Append '_hist' to the task_id
 
-        # Create the nested structure for DBtoRedshift
-        db_to_redshift = {
+        # Create the nested structure for the historical task
+        hist_db_to_redshift = {
             "DBtoRedshift": {
-                "task_id": task_id,
-                "source_db": source_db,
-                "source_schema": schema_name,
-                "source_table": table_name_without_schema,
+                "task_id": hist_task_id,
+                "source_db": row.source_db,
+                "source_schema": row.hist_source_schema,  # Use value from "Source Archival/History Schema Name"
+                "source_table": row.hist_source_table,  # Use value from "Source Archival/History Table Name" without schema
                 "source_secret_name": secret_name,  # Use the secret name if available, otherwise null
-                "source_type": row["source system db type"],
+                "source_type": row.source_type,
                 "target_schema": "srcl",  # Fixed value for target_schema
                 "target_database": "kmbl_dex",
-                "target_table": target_table,
+                "target_table": row.target_table,
                 "db_user": "de_etl_role",
                 "transformation_function": "bods_truncate_and_load_transformation",
-                "column_list": [col for col in column_list if col not in OGG_COLUMNS_TO_EXCLUDE]  # Exclude OGG columns
+                "column_list": db_columns  # Same columns as the main task
             }
         }
 
         # Add column_rename parameter if any columns were renamed
         if column_rename:
-            db_to_redshift["DBtoRedshift"]["column_rename"] = column_rename
-
-        # Check if "Source Table Size (GB)" is greater than 10
-        source_table_size_gb = row["source table size (gb)"]
-        if pd.notna(source_table_size_gb) and source_table_size_gb > 10:
-            # Add source_partition_column and source_predicate_count after target_table
-            reliable_date_column = row["reliable date column"]
-            if pd.notna(reliable_date_column):
-                db_to_redshift["DBtoRedshift"]["source_partition_column"] = reliable_date_column
-                db_to_redshift["DBtoRedshift"]["source_predicate_count"] = 20  # Fixed value
-
-        # Append this structure to the YAML data list
-        yaml_data.append(db_to_redshift)
-
-        # Check if the table is archived (Table Archived (Y/N) == 'Y')
-        if row["table archived (y/n)"] == "Y":
-            # Create a new task for the historical/archived table
-            hist_task_id = f"{task_id}_hist"  # Append '_hist' to the task_id
-            hist_source_schema = row["source archival/history schema name"]
-            hist_source_table = row["source archival/history table name"]
-
-            # Extract the table name without the schema and without appending '_hist'
-            hist_source_table_without_schema = hist_source_table.split(".")[-1]
-
-            # Create the nested structure for the historical task
-            hist_db_to_redshift = {
-                "DBtoRedshift": {
-                    "task_id": hist_task_id,
-                    "source_db": source_db,
-                    "source_schema": hist_source_schema,  # Use value from "Source Archival/History Schema Name"
-                    "source_table": hist_source_table_without_schema,  # Use value from "Source Archival/History Table Name" without schema
-                    "source_secret_name": secret_name,  # Use the secret name if available, otherwise null
-                    "source_type": row["source system db type"],
-                    "target_schema": "srcl",  # Fixed value for target_schema
-                    "target_database": "kmbl_dex",
-                    "target_table": target_table,
-                    "db_user": "de_etl_role",
-                    "transformation_function": "bods_truncate_and_load_transformation",
-                    "column_list": [col for col in column_list if col not in OGG_COLUMNS_TO_EXCLUDE]  # Exclude OGG columns
-                }
+            hist_db_to_redshift["DBtoRedshift"]["column_rename"] = column_rename
+
+        # Add the same partitioning as the main task for large tables
+        if row.is_large:
+            hist_db_to_redshift["DBtoRedshift"]["source_partition_column"] = row.reliable_date_column
+            hist_db_to_redshift["DBtoRedshift"]["source_predicate_count"] = predicate_count
+
+        # Append this structure to the DBtoRedshift task list
+        db_tasks.append(hist_db_to_redshift)
+
+    # Check if task2 is OGGToRedshift
+    if row.is_ogg:
+        # Create the nested structure for OGGToRedshift
+        ogg_to_redshift = {
+            "OGGToRedshift": {
+                "task_id": row.ogg_task_id,  # task_id with 'de_etl_' replaced by 'de_ogg_'
+                "source_db": row.source_db,
+                "source_schema": row.schema_name,
+                "primary_keys": row.primary_keys,  # Single or multiple comma-separated values, or None
+                "redshift_table": row.target_table,
+                "db_user": "de_etl_role",
+                "column_list": all_columns if all_columns else None
             }
+        }
 
-            # Add column_rename parameter if any columns were renamed
-            if column_rename:
-                hist_db_to_redshift["DBtoRedshift"]["column_rename"] = column_rename
-
-            # Check if "Source Table Size (GB)" is greater than 10 for historical task
-            if pd.notna(source_table_size_gb) and source_table_size_gb > 10:
-                # Add source_partition_column and source_predicate_count after target_table
-                reliable_date_column = row["reliable date column"]
-                if pd.notna(reliable_date_column):
-                    hist_db_to_redshift["DBtoRedshift"]["source_partition_column"] = reliable_date_column
-                    hist_db_to_redshift["DBtoRedshift"]["source_predicate_count"] = 20  # Fixed value
-
-            # Append this structure to the YAML data list
-            yaml_data.append(hist_db_to_redshift)
-
-        # Check if task2 is OGGToRedshift
-        if row["task2"] == "OGGToRedshift":
-            # Replace 'etl' with 'ogg' in task_id
-            ogg_task_id = task_id.replace("de_etl_", "de_ogg_")
-
-            # Handle primary_keys (single or multiple values)
-            primary_keys = row["source table pk"]
-            if pd.notna(primary_keys):
-                primary_keys_list = [key.strip() for key in primary_keys.split(",")]
-            else:
-                primary_keys_list = None
-
-            # Create the nested structure for OGGToRedshift
-            ogg_to_redshift = {
-                "OGGToRedshift": {
-                    "task_id": ogg_task_id,
-                    "source_db": source_db,
-                    "source_schema": schema_name,
-                    "primary_keys": primary_keys_list,
-                    "redshift_table": target_table,
-                    "db_user": "de_etl_role",
-                    "column_list": column_list if column_list else None
-                }
-            }
+        # Add column_rename parameter if any columns were renamed
+        if column_rename:
+            ogg_to_redshift["OGGToRedshift"]["column_rename"] = column_rename
+
+        # Append this structure to the OGGToRedshift task list
+        ogg_tasks.append(ogg_to_redshift)
 
-            # Add column_rename parameter if any columns were renamed
-            if column_rename:
-                ogg_to_redshift["OGGToRedshift"]["column_rename"] = column_rename
+    return db_tasks, ogg_tasks
 
-            # Append this structure to the YAML data list for OGGToRedshift.yml
-            yaml_data2.append(ogg_to_redshift)
+def process_row(row, json_folder, srcl_vw_folder, secret_names, output_json_folder=None, keywords=None, output=None,
+                metadata_cache=None, sizing=None, fsync=False):
+    """
+    Build the DBtoRedshift and OGGToRedshift tasks of one TableRow, write its enriched JSON
+    metadata and render its SQL view. Returns a RowResult (empty task lists for a skipped row).
+    Without an output writer, the JSON file is flushed to disk if fsync is set.
+    """
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    metadata = None
+    view = None
+    io_stats = IOStats()
+    rename_stats = Counter()
+    if output_json_folder is None:
+        output_json_folder = json_folder
+
+    # Extract the table name
+    index = row.index
+    table_name = row.table_name
+
+    # Debug: Log table_name and its type
+    logger.debug("Processing row %d: table_name = %s, type = %s", index + 1, table_name, type(table_name))
+
+    # Skip rows with missing table_name
+    if pd.isna(table_name):
+        logger.warning("Skipping row %d because 'source table name' is missing.", index + 1)
+        timing = (time.perf_counter() - start_wall, time.thread_time() - start_cpu)
+        return RowResult([], [], metadata, view, io_stats, rename_stats, timing)
+
+    # Skip rows whose table name could not be split into schema and table
+    if row.table_name_without_schema is None:
+        logger.error("'source table name' is not a valid string in row %d. Value: %s", index + 1, table_name)
+        timing = (time.perf_counter() - start_wall, time.thread_time() - start_cpu)
+        return RowResult([], [], metadata, view, io_stats, rename_stats, timing)
+
+    # Read the JSON file to get column names
+    json_file_name = row.json_file
+    json_file_path = os.path.join(json_folder, json_file_name) if isinstance(json_file_name, str) else None
+
+    # Initialize an empty list for column names
+    column_list = []
+    column_rename = {}  # Dictionary to track renamed columns
+    predicate_count = DEFAULT_PREDICATE_COUNT
+
+    # Get the secret name for the source_db
+    secret_name = get_secret_name(row.source_db, secret_names)
+
+    # Check if the JSON file exists
+    if json_file_path is not None and os.path.exists(json_file_path):
+        # Load the JSON metadata once; the SQL and temp stages reuse it
+        if metadata_cache is not None:
+            metadata = metadata_cache.load(json_file_path, io_stats, stage="yaml")
+        else:
+            metadata = TableMetadata.load(json_file_path, io_stats, stage="yaml")
+        column_list, column_rename = enrich_metadata(metadata, row, get_renamer(keywords), rename_stats)
+        if sizing is not None:
+            predicate_count = sizing.size_table(row, metadata.data)
+            # The recommended encodings only go to the temp copy; the srcl metadata, which may be
+            # the input file itself, is written as it would be without sizing
+            metadata.temp_columns = sizing.recommend_encodings(metadata.columns)
+
+        # Write the updated JSON data back to the file (or to the output folder)
+        output_json_path = os.path.join(output_json_folder, json_file_name)
+        save_json(metadata, output_json_path, io_stats, stage="yaml", output=output, metadata_cache=metadata_cache, fsync=fsync)
+
+        # Render the SQL view for this JSON file
+        view = render_table_view(
+            output_json_path,  # Pass the JSON file path
+            column_list,
+            row.table_classification,
+            row.is_pii,
+            row.is_spii,
+            row.pii_column_name,
+            row.spii_column_name,
+            srcl_vw_folder,  # Pass the srcl_vw folder path
+            metadata=metadata,
+            io_stats=io_stats
+        )
+    else:
+        logger.warning("JSON file '%s' not found for table '%s'.", json_file_name, table_name)
+        if sizing is not None:
+            predicate_count = sizing.size_table(row)
 
-    # Write to YAML file for DBtoRedshift
-    with open(output_yaml, "w") as yaml_file:
-        yaml.dump(yaml_data, yaml_file, default_flow_style=False, sort_keys=False, default_style=None)
+    # Debug: Log column_rename dictionary
+    logger.debug("Column rename dictionary for row %d: %s", index + 1, column_rename)
 
-    print(f"YAML file '{output_yaml}' created successfully!")
+    db_tasks, ogg_tasks = build_tasks(row, column_list, column_rename, secret_name, predicate_count)
 
-    # Write to YAML file for OGGToRedshift (if any data exists)
-    if yaml_data2:
-        with open(output_yaml2, "w") as yaml_file2:
-            yaml.dump(yaml_data2, yaml_file2, default_flow_style=False, sort_keys=False, default_style=None)
+    timing = (time.perf_counter() - start_wall, time.thread_time() - start_cpu)
+    return RowResult(db_tasks, ogg_tasks, metadata, view, io_stats, rename_stats, timing)
 
-        print(f"YAML file '{output_yaml2}' created successfully!")
+def process_rows(rows, json_folder, srcl_vw_folder, secret_names, workers=1, use_processes=False, output_json_folder=None,
+                 keywords=None, output=None, metadata_cache=None, sizing=None):
+    """
+    Run process_row over a list of TableRows, serially or on a thread or process pool,
+    and yield the results in row order.
+    """
+    # Rows sharing a JSON file rewrite the same file, so their order matters
+    json_file_counts = Counter(row.json_file for row in rows if isinstance(row.json_file, str))
+    shared_json_files = {json_file for json_file, count in json_file_counts.items() if count > 1}
+    if workers > 1 and shared_json_files:
+        logger.warning("Several rows share a JSON file. Processing rows serially.")
+        workers = 1
+
+    if workers <= 1:
+        for row in rows:
+            # A row reading a JSON file that an earlier row rewrote has to see that write
+            if output is not None and row.json_file in shared_json_files:
+                output.wait()
+            yield process_row(row, json_folder, srcl_vw_folder, secret_names, output_json_folder, keywords, output, metadata_cache,
+                              sizing)
+        return
+
+    # executor.map yields results in submission order, i.e. spreadsheet order
+    if use_processes:
+        # The processes write the JSON files themselves, as the output writer would (fsync included)
+        worker = partial(process_row, json_folder=json_folder, srcl_vw_folder=srcl_vw_folder, secret_names=secret_names,
+                         output_json_folder=output_json_folder, keywords=keywords, sizing=sizing,
+                         fsync=output is not None and output.fsync)
+        # Hand rows to the processes in chunks to keep the pickling overhead down
+        chunksize = max(1, len(rows) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(worker, rows, chunksize=chunksize)
+        return
+
+    worker = partial(process_row, json_folder=json_folder, srcl_vw_folder=srcl_vw_folder, secret_names=secret_names,
+                     output_json_folder=output_json_folder, keywords=keywords, output=output, metadata_cache=metadata_cache,
+                     sizing=sizing)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(worker, rows)
+
+def row_outputs(row, json_folder, output_json_folder, srcl_vw_folder):
+    """
+    Return the JSON file path of a row and the files generated from it.
+    """
+    json_file_name = row.json_file
+    if not isinstance(json_file_name, str):
+        return None, []
+
+    json_file_path = os.path.join(json_folder, json_file_name)
+    if not os.path.exists(json_file_path) or row.table_name_without_schema is None:
+        # Rows skipped for a missing or invalid table name generate nothing
+        return json_file_path, []
+
+    temp_folder = os.path.join(os.path.dirname(output_json_folder), "temp")
+    outputs = [os.path.join(output_json_folder, json_file_name), os.path.join(temp_folder, json_file_name)]
+    sql_file_path = os.path.join(srcl_vw_folder, os.path.splitext(json_file_name)[0] + ".sql")
+    if os.path.exists(sql_file_path):
+        outputs.append(sql_file_path)
+    return json_file_path, outputs
+
+# Values of generate_yaml's shard_by
+SHARD_KEYS = ("system", "source_db", "frequency", "size")
+
+def shard_key(row, shard_by):
+    """
+    Return the shard of a row's tasks for shard_by "system" (the source system name),
+    "source_db" or "frequency" (the data refresh frequency). The system name and the
+    frequency are taken back from the target table and the task_id they were built into.
+    Rows without a valid table name have no tasks, and no key.
+    """
+    if row.target_table is None:
+        return None
+    if shard_by == "system":
+        return row.target_table[:-len(row.table_name_without_schema) - 1]
+    if shard_by == "source_db":
+        return row.source_db
+    if shard_by == "frequency":
+        return row.task_id[len(f"de_etl_{row.target_table}_"):]
+    return None
+
+def task_writer(target, write_empty=True, fsync=True, shard_by=None, shard_size=1000, workers=4):
+    """
+    Return a context manager for a TaskStreamWriter: a new writer for a file path, closed on
+    exit, or an already open TaskStreamWriter passed as target, which is left open.
+    With shard_by, a file path gets a ShardedTaskWriter writing to the folder of the same
+    name without the extension (e.g. DBtoRedshift/ for DBtoRedshift.yml).
+    """
+    if isinstance(target, (TaskStreamWriter, ShardedTaskWriter)):
+        return contextlib.nullcontext(target)
+    if shard_by:
+        return ShardedTaskWriter(os.path.splitext(target)[0], shard_by, shard_size=shard_size if shard_by == "size" else None,
+                                 write_empty=write_empty, fsync=fsync, workers=workers)
+    return TaskStreamWriter(target, write_empty=write_empty, fsync=fsync)
+
+def warn_lost_column_renames(row, db_tasks, previous_renames):
+    """
+    Warn about the tasks of a rebuilt row that had a column_rename in the last run and no longer
+    have one: its JSON file was rewritten in place with the renamed columns, so they are not renamed again.
+    """
+    for task in db_tasks:
+        body = task.get("DBtoRedshift", {})
+        if body.get("task_id") in previous_renames and not body.get("column_rename"):
+            logger.warning("Row %d: task '%s' had a column_rename in the last run that is gone; its JSON file was "
+                           "rewritten in place with the renamed columns. Use --output-dir for repeatable output.",
+                           row.index + 1, body["task_id"])
+
+def report_problems(problems):
+    """
+    Log the problems found by the validation and raise a ValidationError if any is an error.
+    """
+    errors, warnings = log_problems(problems)
+    logger.info("Validation: %d errors, %d warnings.", errors, warnings)
+    if errors:
+        raise ValidationError(problems)
+
+def generate_yaml(df, output_yaml, output_yaml2, json_folder, workers=1, use_processes=False, manifest_path=None, force=False,
+                  output_dir=None, keywords=None, io_workers=4, fsync=True, temp_all_files=False, temp_links="copy", report=None,
+                  secret_index=None, metadata_cache=None, validate_first=True, shard_by=None, shard_size=1000, sizing=None):
+    """
+    Generate DBtoRedshift.yml, OGGToRedshift.yml, the SQL views and the temp folder from the
+    Excel rows (a DataFrame or iter_excel_rows pairs) and return the run summary.
+    """
+    if report is None:
+        report = RunReport()
+
+    io_stats = IOStats()
+    if validate_first and metadata_cache is None and not use_processes:
+        # The JSON files parsed by the validation are read from here again by process_row
+        metadata_cache = MetadataCache()
+    # Index the secret names of the secret_name.json file (located outside the srcl folder)
+    secret_file_path = os.path.join(os.path.dirname(json_folder), "secret_name.json")
+    if secret_index is None:
+        with report.stage("load_secrets"):
+            secret_index = load_secret_index(secret_file_path)
+
+    # Resolve the keyword set once; worker processes build their own renamer from it
+    keywords = get_renamer(keywords).keywords
+
+    # Generated files go next to the srcl folder, unless an output directory is given
+    if output_dir:
+        output_json_folder = os.path.join(output_dir, os.path.basename(os.path.normpath(json_folder)))
     else:
-        print("No OGGToRedshift tasks found. Skipping creation of OGGToRedshift.yml.")
+        output_json_folder = json_folder
+    srcl_vw_folder = os.path.join(os.path.dirname(output_json_folder), "srcl_vw")
+
+    manifest = None
+    if manifest_path:
+        manifest = BuildManifest(manifest_path, secret_file_path, force=force, keywords=keywords,
+                                 sizing=sizing.version if sizing is not None else None)
+    validator = ChunkValidator(json_folder, io_workers, metadata_cache, io_stats) if validate_first else None
+
+    # First pass, before anything is written: check the rows, prepare them and look them up in the
+    # manifest. A DataFrame is one chunk; streamed rows are read, checked and prepared in chunks
+    # that are spilled to a RowSpool, so that only one chunk of rows is held in memory at a time.
+    streamed = not isinstance(df, pd.DataFrame)
+    chunks = iter_pair_chunks(df) if streamed else iter([df])
+    df = None
+    spool = RowSpool() if streamed else []
+    row_count = 0
+    row_keys = []
+    cached_results = {}
+    missing_secrets = {}
+    while True:
+        with report.stage("read_excel"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+
+        if validator is not None:
+            with report.stage("validate", io_stats):
+                row_numbers, values = record_columns(chunk) if streamed else frame_columns(chunk)
+                validator.check_rows(row_numbers, values)
+                if validator.has_errors:
+                    # The run stops after the first pass, so only the problems are still collected;
+                    # the JSON files of every row are checked so that they are all listed
+                    validator.check_json_files(row_numbers, values)
+                    continue
+                if manifest is None:
+                    validator.check_json_files(row_numbers, values)
+
+        with report.stage("prepare_rows"):
+            rows = prepare_pair_chunk(chunk) if streamed else prepare_rows(chunk)
+        chunk = None
+
+        # Note the rows that will get a null source_secret_name
+        for source_db, row_numbers in secret_index.missing_rows(rows).items():
+            missing_secrets.setdefault(source_db, []).extend(row_numbers)
+
+        # Reuse the cached tasks of unchanged rows
+        if manifest is not None:
+            with report.stage("manifest_lookup", io_stats):
+                pending_rows = []
+                for position, row in enumerate(rows, row_count):
+                    row_keys.append(row_fingerprint(row))
+                    json_file_path, outputs = row_outputs(row, json_folder, output_json_folder, srcl_vw_folder)
+                    cached = manifest.lookup(row_keys[position], json_file_path, outputs, io_stats)
+                    if cached is None:
+                        pending_rows.append(row)
+                    else:
+                        cached_results[position] = cached
+            if validator is not None:
+                # The JSON files of rows reused from the build manifest were fine when they were last built
+                with report.stage("validate", io_stats):
+                    validator.check_row_json_files(pending_rows)
+        row_count += len(rows)
+        spool.append(rows)
+
+    if validator is not None:
+        report_problems(validator.finish())
+    for source_db, row_numbers in missing_secrets.items():
+        logger.warning("No secret found for source_db '%s' (rows %s).", source_db, ", ".join(map(str, row_numbers)))
+    if manifest is not None:
+        logger.info("Build manifest: %d rows unchanged, %d rows to rebuild.", len(cached_results), row_count - len(cached_results))
+
+    # Nothing is written before the validation, so the output folders are only created now
+    if not os.path.exists(output_json_folder):
+        os.makedirs(output_json_folder)
+        logger.info("Created output metadata folder at: %s", output_json_folder)
+    # Create the srcl_vw folder if it doesn't exist
+    if not os.path.exists(srcl_vw_folder):
+        os.makedirs(srcl_vw_folder)
+        logger.info("Created srcl_vw folder at: %s", srcl_vw_folder)
+
+    # Second pass: process the changed rows of each chunk and stream the tasks of every row, in
+    # spreadsheet order, to DBtoRedshift.yml and OGGToRedshift.yml (only if it has tasks). The
+    # SQL views, manifest entries and temp copies of a chunk are written before the next chunk.
+    output = OutputWriter(workers=io_workers, fsync=fsync)
+    rename_stats = Counter()
+    temp_file_names = set()
+    only_stale = manifest is not None and not force
+    first_position = 0
+    with contextlib.ExitStack() as writers:
+        db_writer = writers.enter_context(task_writer(output_yaml, fsync=fsync, shard_by=shard_by, shard_size=shard_size,
+                                                      workers=io_workers))
+        ogg_writer = writers.enter_context(task_writer(output_yaml2, write_empty=False, fsync=fsync, shard_by=shard_by,
+                                                       shard_size=shard_size, workers=io_workers))
+        sql_writer = writers.enter_context(SqlViewWriter(srcl_vw_folder, io_stats=io_stats, output=output))
+        ogg_count = ogg_writer.count
+        for rows in spool:
+            if first_position:
+                # The rows of this chunk may read JSON files written for the chunks before it
+                with report.stage("output_wait"):
+                    output.wait()
+            tables = []
+            rebuilt = []
+            with report.stage("tables", io_stats):
+                results = process_rows([row for position, row in enumerate(rows, first_position) if position not in cached_results],
+                                       json_folder, srcl_vw_folder, secret_index, workers, use_processes, output_json_folder,
+                                       keywords, output, metadata_cache, sizing)
+                for position, row in enumerate(rows, first_position):
+                    fragments = (None, None)
+                    cached = position in cached_results
+                    if cached:
+                        db_tasks, ogg_tasks = cached_results.pop(position)
+                        # Unchanged rows are written from the YAML rendered by the last run
+                        fragments = manifest.yaml_fragments(row_keys[position]) or fragments
+                    else:
+                        result = next(results)
+                        db_tasks, ogg_tasks = result.db_tasks, result.ogg_tasks
+                        io_stats.merge(result.io_stats)
+                        rename_stats.update(result.rename_stats)
+                        report.add_table(row, result.timing, result.io_stats)
+                        if result.metadata is not None:
+                            tables.append(result.metadata)
+                        if result.view is not None:
+                            sql_writer.add(*result.view)
+                    if shard_by:
+                        key = shard_key(row, shard_by)
+                        db_writer.write(db_tasks, key)
+                        ogg_writer.write(ogg_tasks, key)
+                    else:
+                        fragments = (db_writer.write(db_tasks, fragments[0]), ogg_writer.write(ogg_tasks, fragments[1]))
+                    if manifest is not None and not cached:
+                        rebuilt.append((position, row, db_tasks, ogg_tasks, fragments))
+                # The manifest records the SQL views of the chunk as its outputs
+                sql_writer.flush()
+
+            # The manifest hashes the JSON files as written, so wait for the queued writes first
+            with report.stage("output_wait"):
+                output.wait()
+            if manifest is not None:
+                with report.stage("manifest_record", io_stats):
+                    for position, row, db_tasks, ogg_tasks, fragments in rebuilt:
+                        warn_lost_column_renames(row, db_tasks, manifest.previous_column_renames())
+                        json_file_path, outputs = row_outputs(row, json_folder, output_json_folder, srcl_vw_folder)
+                        manifest.record(row_keys[position], json_file_path, (db_tasks, ogg_tasks), outputs, io_stats,
+                                        fragments)
+
+            # Update schemaName in the temp copies of the chunk's JSON files after all changes
+            with report.stage("temp", io_stats):
+                create_temp_folder_and_update_schema(output_json_folder, only_stale=only_stale, tables=tables, io_stats=io_stats,
+                                                     output=output, all_files=False, links=temp_links)
+            temp_file_names.update(metadata.file_name for metadata in tables)
+            first_position += len(rows)
+
+        with report.stage("tables", io_stats):
+            writers.close()
+    if streamed:
+        spool.close()
+
+    logger.info("YAML file '%s' created successfully!", db_writer.yaml_path)
+    if ogg_writer.count > ogg_count:
+        logger.info("YAML file '%s' created successfully!", ogg_writer.yaml_path)
+    else:
+        logger.info("No OGGToRedshift tasks found. Skipping creation of OGGToRedshift.yml.")
+
+    # Create the temp folder, with the copies of the other JSON files if asked for
+    with report.stage("temp", io_stats):
+        create_temp_folder_and_update_schema(output_json_folder, only_stale=only_stale, io_stats=io_stats, output=output,
+                                             all_files=temp_all_files, links=temp_links, written_file_names=temp_file_names)
+    with report.stage("output_wait"):
+        output_stats = output.close()
+
+    if manifest is not None:
+        with report.stage("manifest_save"):
+            manifest.save()
+
+    # Summarise the file I/O of each stage (including the existing files the output writer
+    # read to skip unchanged content) and the keyword renaming cache
+    io_stats.add("output", "reads", output_stats["compared"])
+    lookups = rename_stats["hits"] + rename_stats["misses"]
+    summary = {
+        "io": io_stats.summary(),
+        "keyword_cache": {
+            "hits": rename_stats["hits"],
+            "misses": rename_stats["misses"],
+            "hit_rate": round(rename_stats["hits"] / lookups, 4) if lookups else 0.0,
+            "collisions": rename_stats["collisions"],
+        },
+        "missing_secrets": missing_secrets,
+        "output": output_stats,
+    }
+    if sizing is not None:
+        summary["sizing"] = sizing.stats()
+    if shard_by:
+        summary["shards"] = {"DBtoRedshift": db_writer.stats, "OGGToRedshift": ogg_writer.stats}
+    logger.info("File I/O per stage:")
+    for stage, counts in summary["io"].items():
+        logger.info("  %s: %d reads, %d writes", stage, counts["reads"], counts["writes"])
+    logger.info("Output files: %d written, %d unchanged (%d bytes, %d existing files compared)", output_stats["written"],
+                output_stats["unchanged"], output_stats["bytes"], output_stats["compared"])
+    keyword_cache = summary["keyword_cache"]
+    logger.info("Keyword rename cache: %d hits, %d misses (%.1f%% hit rate), %d collisions", keyword_cache["hits"],
+                keyword_cache["misses"], keyword_cache["hit_rate"] * 100, keyword_cache["collisions"])
+    return summary
+
+def generate_sql_views(df, json_folder, output_dir=None, keywords=None, io_workers=4, fsync=True):
+    """
+    Write only the srcl_vw SQL views of the template rows, as generate_yaml would render them,
+    without rewriting the JSON metadata or writing the temp copies and the YAML files.
+    The views go to srcl_vw next to json_folder, or under output_dir if given.
+    Returns the number of views written.
+    """
+    srcl_vw_folder = os.path.join(output_dir or os.path.dirname(json_folder), "srcl_vw")
+    if not os.path.exists(srcl_vw_folder):
+        os.makedirs(srcl_vw_folder)
+        logger.info("Created srcl_vw folder at: %s", srcl_vw_folder)
+
+    renamer = get_renamer(keywords)
+    rows = prepare_rows(df) if isinstance(df, pd.DataFrame) else prepare_row_pairs(df)
+    with OutputWriter(workers=io_workers, fsync=fsync) as output, \
+            SqlViewWriter(srcl_vw_folder, output=output) as sql_writer:
+        for row in rows:
+            if row.table_name_without_schema is None or not isinstance(row.json_file, str):
+                continue
+            json_file_path = os.path.join(json_folder, row.json_file)
+            if not os.path.exists(json_file_path):
+                logger.warning("JSON file '%s' not found for table '%s'.", row.json_file, row.table_name)
+                continue
+
+            # Enrich the metadata in memory only, for the column list of the view
+            metadata = TableMetadata.load(json_file_path)
+            column_list, _ = enrich_metadata(metadata, row, renamer)
+            sql_writer.add(*render_table_view(
+                json_file_path, column_list, row.table_classification, row.is_pii, row.is_spii, row.pii_column_name,
+                row.spii_column_name, srcl_vw_folder, metadata=metadata
+            ))
+    return sql_writer.count
+
+def plan_tasks(df, json_folder, manifest_path=None, output_dir=None, keywords=None, secret_index=None, sizing=None):
+    """
+    Build the tasks generate_yaml would write for the template now, without writing anything.
+    As in generate_yaml, rows unchanged since the last run (per the build manifest at manifest_path)
+    give their recorded tasks, and the other rows are built from their JSON files, enriched in
+    memory only. Rows sharing a JSON file see the enrichment of the rows before them, as they
+    would when the file is rewritten in place (not with an output_dir). Pass the sizing engine
+    the files are generated with, if any.
+    Returns the (db_tasks, ogg_tasks) lists in spreadsheet order.
+    """
+    secret_file_path = os.path.join(os.path.dirname(json_folder), "secret_name.json")
+    if secret_index is None:
+        secret_index = load_secret_index(secret_file_path)
+    keywords = get_renamer(keywords).keywords
+    renamer = get_renamer(keywords)
+
+    output_json_folder = os.path.join(output_dir, os.path.basename(os.path.normpath(json_folder))) if output_dir else json_folder
+    srcl_vw_folder = os.path.join(os.path.dirname(output_json_folder), "srcl_vw")
+    rows = prepare_rows(df) if isinstance(df, pd.DataFrame) else prepare_row_pairs(df)
+    manifest = BuildManifest(manifest_path, secret_file_path, keywords=keywords,
+                             sizing=sizing.version if sizing is not None else None) if manifest_path else None
+    metadata_cache = MetadataCache()
+
+    db_tasks = []
+    ogg_tasks = []
+    for row in rows:
+        json_file_path, outputs = row_outputs(row, json_folder, output_json_folder, srcl_vw_folder)
+        cached = manifest.lookup(row_fingerprint(row), json_file_path, outputs) if manifest is not None else None
+        if cached is not None:
+            db_tasks.extend(cached[0])
+            ogg_tasks.extend(cached[1])
+            continue
 
-    # Create the temp folder and update schemaName in JSON files after all changes
-    create_temp_folder_and_update_schema(json_folder)
\ No newline at end of file
+        # Rows generate_yaml skips have no tasks
+        if pd.isna(row.table_name) or row.table_name_without_schema is None:
+            continue
+
+        column_list = []
+        column_rename = {}
+        json_data = None
+        if json_file_path is not None and os.path.exists(json_file_path):
+            metadata = metadata_cache.load(json_file_path)
+            column_list, column_rename = enrich_metadata(metadata, row, renamer)
+            json_data = metadata.data
+        predicate_count = sizing.size_table(row, json_data) if sizing is not None else DEFAULT_PREDICATE_COUNT
+        if json_data is not None and not output_dir:
+            metadata_cache.update(json_file_path, metadata.to_json())
+        row_db_tasks, row_ogg_tasks = build_tasks(row, column_list, column_rename, get_secret_name(row.source_db, secret_index),
+                                                  predicate_count)
+        db_tasks.extend(row_db_tasks)
+        ogg_tasks.extend(row_ogg_tasks)
+    return db_tasks, ogg_tasks